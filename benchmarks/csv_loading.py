@@ -0,0 +1,140 @@
+"""Compara a leitura dos CSV's de ações da versão anterior de merge_csv_to_df com a atual.
+
+Uso: python benchmarks/csv_loading.py [arquivos] [dias] [limite em segundos da versão anterior]
+
+Gera arquivos sintéticos no formato de dataset/stocks e mede as duas versões em pastas com
+quantidades crescentes de arquivos, até o total pedido (padrão: 5.000). A versão anterior cresce
+com o quadrado da quantidade de arquivos e deixa de ser medida quando passa do limite (padrão: 300 s).
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+COLUMNS = [
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume_dollar",
+    "volume_shares",
+    "volume_ticks",
+    "avg",
+]
+
+
+def synthetic_csvs(directory, files, days, seed=0):
+    """Grava um CSV por ação, com as colunas de dataset/stocks e períodos de negociação diferentes.
+    Uma em cada cem ações tem o arquivo vazio (apenas o cabeçalho)
+
+    Arguments:
+        directory {str} -- Pasta dos arquivos
+        files {int} -- Quantidade de ações
+        days {int} -- Quantidade de dias úteis do período completo
+
+    Keyword Arguments:
+        seed {int} -- Semente do gerador (default: {0})
+    """
+    rng = np.random.RandomState(seed)
+    dates = pd.bdate_range("2008-01-01", periods=days).strftime("%Y-%m-%d")
+    for i in range(files):
+        first = rng.randint(0, days // 2)
+        last = rng.randint(days // 2, days) + 1
+        if i % 100 == 99:
+            first = last
+        close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, last - first)))
+        values = np.column_stack([close] * len(COLUMNS))
+        frame = pd.DataFrame(values, index=list(dates[first:last]), columns=COLUMNS)
+        frame.to_csv(os.path.join(directory, "S{:05d}.csv".format(i)))
+
+
+def legacy_merge_csv_to_df(path):
+    """merge_csv_to_df anterior: cada arquivo é lido duas vezes, com todas as colunas, e o painel
+    cresce com um join por arquivo"""
+    list_of_csvs = os.listdir(path)
+    last_row_date = []
+    first_row_date = []
+    for n, company in enumerate(list_of_csvs):
+        if n == 0:
+            prices = pd.DataFrame(
+                index=pd.read_csv(os.path.join(path, company))["Unnamed: 0"]
+            )
+        company_data = pd.read_csv(os.path.join(path, company))
+        ticker = company[:-4]
+        if company_data.empty:
+            pass
+        else:
+            last_row_date.append(company_data.loc[company_data.index[-1]]["Unnamed: 0"])
+            first_row_date.append(company_data.loc[0]["Unnamed: 0"])
+            company_data.rename(columns={"close": ticker}, inplace=True)
+            company_data.drop(
+                [
+                    "open",
+                    "high",
+                    "low",
+                    "volume_dollar",
+                    "volume_shares",
+                    "volume_ticks",
+                    "avg",
+                ],
+                1,
+                inplace=True,
+            )
+            company_data.set_index("Unnamed: 0", drop=True, inplace=True)
+            del company_data.index.name
+            prices = prices.join(company_data, how="outer")
+    return prices
+
+
+def timed(function, *args, **kwargs):
+    """Executa a função e retorna o resultado e o tempo em segundos"""
+    start = time.time()
+    result = function(*args, **kwargs)
+    return result, time.time() - start
+
+
+if __name__ == "__main__":
+    from fineng.datawrangling import merge_csv_to_df
+
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 756
+    legacy_limit = float(sys.argv[3]) if len(sys.argv) > 3 else 300
+
+    root = tempfile.mkdtemp(prefix="fineng_csv_")
+    try:
+        source = os.path.join(root, "all")
+        os.makedirs(source)
+        synthetic_csvs(source, files, days)
+        names = sorted(os.listdir(source))
+
+        sizes = [files]
+        while sizes[0] > 500:
+            sizes.insert(0, sizes[0] // 2)
+
+        legacy = True
+        for size in sizes:
+            # Cada tamanho lê uma pasta própria com os primeiros arquivos (links, sem copiar os dados)
+            directory = os.path.join(root, str(size))
+            os.makedirs(directory)
+            for name in names[:size]:
+                os.link(os.path.join(source, name), os.path.join(directory, name))
+
+            row = {"arquivos": size}
+            for executor in ("threads", "processes"):
+                prices, seconds = timed(merge_csv_to_df, directory, executor=executor)
+                row[executor + " (s)"] = round(seconds, 2)
+            if legacy:
+                expected, seconds = timed(legacy_merge_csv_to_df, directory)
+                row["anterior (s)"] = round(seconds, 2)
+                row["iguais"] = prices.equals(expected[prices.columns])
+                legacy = seconds < legacy_limit
+            print(row, flush=True)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
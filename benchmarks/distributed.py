@@ -0,0 +1,88 @@
+"""Simula vários nós da execução distribuída em um único computador.
+
+Uso: python benchmarks/distributed.py [workers] [dias] [ações]
+
+O coordenador grava a fila, os workers rodam em processos separados (python -m fineng.distributed),
+e um deles é encerrado à força no meio da execução: a tarefa que ele tinha reservado volta para a
+fila quando o prazo da reserva expira. Ao final, as estratégias montadas com collect são comparadas
+com as mesmas estratégias calculadas por sweep.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from memory import synthetic_returns
+
+LEASE = 5
+
+
+if __name__ == "__main__":
+    from fineng.distributed import JobQueue, collect, distribute
+    from fineng.sweep import sweep
+
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 2520
+    assets = int(sys.argv[3]) if len(sys.argv) > 3 else 60
+    rets = synthetic_returns(days, assets)
+    grid = {"method": ["max_sharpe", "min_vol_master"], "time_is": [6, 12]}
+    common = {
+        "date_from": rets.index[days // 2],
+        "date_to": rets.index[-1],
+        "time_os": 1,
+        "max_w": 0.1,
+        "log_path": os.devnull,
+    }
+
+    path = os.path.join(tempfile.mkdtemp(prefix="fineng_queue_"), "queue.db")
+    tasks = distribute(path, rets, grid, **common)
+
+    start = time.time()
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "fineng.distributed", path, str(LEASE)],
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+        )
+        for _ in range(workers)
+    ]
+
+    # Derruba o primeiro worker assim que houver tarefas concluídas, deixando a sua reserva pendurada
+    queue = JobQueue(path)
+    while queue.progress()["done"] == 0:
+        time.sleep(0.1)
+    processes[0].kill()
+    print("worker encerrado à força com", queue.progress())
+
+    strategies = collect(path, poll=1)
+    elapsed = time.time() - start
+    for process in processes:
+        process.wait()
+
+    retried = queue.connection.execute(
+        "SELECT COUNT(*) FROM tasks WHERE attempts > 1"
+    ).fetchone()[0]
+    by_worker = queue.connection.execute(
+        "SELECT worker, COUNT(*) FROM tasks GROUP BY worker"
+    ).fetchall()
+    queue.close()
+    print(
+        "{} janelas em {:.1f} s com {} workers; {} tarefas executadas novamente".format(
+            tasks, elapsed, workers, retried
+        )
+    )
+    print("tarefas por worker:", dict(by_worker))
+
+    reference = sweep(rets, grid, executor="serial", **common)
+    for strategy, expected in zip(strategies, reference):
+        difference = np.abs(
+            strategy.strategy_cumret.values - expected.strategy_cumret.values
+        ).max()
+        print(strategy.name, "diferença máxima para sweep:", difference)
@@ -0,0 +1,108 @@
+"""Mede o pico de memória (RSS) de uma estratégia sobre um painel sintético grande (Linux).
+
+Uso: python benchmarks/memory.py [dias] [ações] [copy]
+
+Cada medição roda em um processo novo, para que o pico de uma não contamine a outra.
+O argumento copy liga Strategy(copy=True), a cópia explícita dos retornos.
+"""
+
+import os
+import resource
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def synthetic_returns(days, assets, seed=0):
+    """Gera retornos diários sintéticos com index em texto, como os lidos de dataset/stocks
+
+    Arguments:
+        days {int} -- Quantidade de dias úteis
+        assets {int} -- Quantidade de ações
+
+    Keyword Arguments:
+        seed {int} -- Semente do gerador (default: {0})
+
+    Returns:
+        DataFrame -- Retornos
+    """
+    rng = np.random.RandomState(seed)
+    dates = pd.bdate_range("2008-01-01", periods=days).strftime("%Y-%m-%d")
+    values = rng.normal(0.0003, 0.02, (days, assets))
+    # Ações que entram na bolsa ao longo do período
+    listing = rng.randint(0, days // 2, assets)
+    values[np.arange(days)[:, None] < listing] = np.nan
+    columns = ["S{:05d}".format(i) for i in range(assets)]
+    return pd.DataFrame(values, index=list(dates), columns=columns)
+
+
+def memory_mb(field):
+    """Lê um campo de memória do processo em /proc/self/status (Linux), em MB
+
+    Arguments:
+        field {str} -- 'VmRSS' (atual) ou 'VmHWM' (pico)
+
+    Returns:
+        float -- Memória em MB
+    """
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+
+
+def measure(days, assets, copy):
+    """Constrói a estratégia e imprime quanto o pico de memória passou do que já estava em uso"""
+    from fineng.strategy import Strategy
+    import fineng.calculation as calc
+
+    rets = synthetic_returns(days, assets)
+    data_mb = rets.values.nbytes / 2**20
+
+    # Zera o pico de memória para medir apenas a estratégia, e não a geração dos dados
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    base_mb = memory_mb("VmRSS")
+
+    kwargs = {"copy": True} if copy else {}
+    strategy = Strategy(
+        method="equally_weighted",
+        name="benchmark",
+        rets=rets,
+        date_from=rets.index[0],
+        date_to=rets.index[-1],
+        log_path=os.devnull,
+        **kwargs
+    )
+    calc.beta(strategy.strategy_ret, strategy.strategy_ret)
+
+    peak_mb = memory_mb("VmHWM")
+    children_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(
+        "dados {:.0f} MB | em uso antes {:.0f} MB | pico {:.0f} MB (+{:.2f}x os dados) | "
+        "pico dos processos do pool {:.0f} MB".format(
+            data_mb,
+            base_mb,
+            peak_mb,
+            (peak_mb - base_mb) / data_mb,
+            children_mb,
+        )
+    )
+
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 2520
+    assets = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+    if "--child" in sys.argv:
+        measure(days, assets, "copy" in sys.argv)
+    else:
+        for mode in ([], ["copy"]):
+            print("copy" if mode else "padrão", end=": ", flush=True)
+            subprocess.run(
+                [sys.executable, __file__, str(days), str(assets), "--child"] + mode,
+                check=True,
+            )
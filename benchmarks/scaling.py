@@ -0,0 +1,73 @@
+"""Mede quantas janelas por segundo uma estratégia resolve em cada executor e quantidade de workers.
+
+Uso: python benchmarks/scaling.py [dias] [ações] [método] [máximo de workers] [arquivo.csv]
+
+A quantidade de workers dobra de 1 até o máximo (padrão: número de núcleos). O modo serial é
+medido uma vez, como referência. O resultado é impresso e, se informado, salvo em CSV.
+"""
+
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from memory import synthetic_returns
+
+
+def measure(rets, method, executor, workers):
+    """Constrói a estratégia e retorna a quantidade de janelas e o tempo total"""
+    from fineng.strategy import Strategy
+
+    start = time.time()
+    strategy = Strategy(
+        method=method,
+        name="benchmark",
+        rets=rets,
+        # Na primeira metade do painel sintético ainda há ações sem histórico completo (ver synthetic_returns)
+        date_from=rets.index[len(rets) // 2],
+        date_to=rets.index[-1],
+        time_is=12,
+        time_os=1,
+        threads=workers,
+        executor=executor,
+        log_path=os.devnull,
+    )
+    return len(strategy.list_of_dates), time.time() - start
+
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 2520
+    assets = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    method = sys.argv[3] if len(sys.argv) > 3 else "max_sharpe"
+    max_workers = int(sys.argv[4]) if len(sys.argv) > 4 else os.cpu_count() or 1
+    rets = synthetic_returns(days, assets)
+
+    workers = [1]
+    while workers[-1] * 2 <= max_workers:
+        workers.append(workers[-1] * 2)
+    runs = [("serial", 1)] + [
+        (executor, n) for executor in ("processes", "threads") for n in workers
+    ]
+
+    rows = []
+    for executor, n in runs:
+        windows, seconds = measure(rets, method, executor, n)
+        rows.append(
+            {
+                "executor": executor,
+                "workers": n,
+                "blas_threads": max(1, (os.cpu_count() or 1) // n),
+                "windows": windows,
+                "seconds": round(seconds, 3),
+                "windows_per_second": round(windows / seconds, 2),
+            }
+        )
+        print(rows[-1], flush=True)
+
+    table = pd.DataFrame(rows)
+    print(table.to_string(index=False))
+    if len(sys.argv) > 5:
+        table.to_csv(sys.argv[5], index=False)
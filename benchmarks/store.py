@@ -0,0 +1,66 @@
+"""Compara o tempo para começar a trabalhar com o painel lido dos CSV's, de um .pickle e do painel binário.
+
+Uso: python benchmarks/store.py [arquivos] [dias]
+
+Os CSV's sintéticos seguem o formato de dataset/stocks (ver csv_loading.py). Além de abrir o painel,
+é medida a leitura de uma janela de um ano, que no painel binário lê apenas as páginas da janela.
+"""
+
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from csv_loading import synthetic_csvs, timed
+
+
+def window_sum(prices):
+    """Lê uma janela de um ano no meio do painel"""
+    middle = len(prices) // 2
+    return np.nansum(np.asarray(prices.iloc[middle : middle + 252]))
+
+
+if __name__ == "__main__":
+    from fineng.datawrangling import csv_to_store, merge_csv_to_df
+    from fineng.store import load_store
+
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 2520
+
+    root = tempfile.mkdtemp(prefix="fineng_store_")
+    try:
+        csv_path = os.path.join(root, "stocks")
+        os.makedirs(csv_path)
+        synthetic_csvs(csv_path, files, days)
+
+        prices, seconds = timed(merge_csv_to_df, csv_path)
+        print("CSV's: {:.3f} s".format(seconds))
+
+        pickle_path = os.path.join(root, "data_input.pickle")
+        with open(pickle_path, "wb") as f:
+            pickle.dump(prices, f)
+
+        def load_pickle():
+            with open(pickle_path, "rb") as f:
+                return pickle.load(f)
+
+        _, seconds = timed(load_pickle)
+        print("pickle: {:.3f} s".format(seconds))
+
+        store_path = os.path.join(root, "store")
+        _, seconds = timed(csv_to_store, store_path, csv_path)
+        print("conversão para o painel binário: {:.3f} s".format(seconds))
+
+        stored, seconds = timed(load_store, store_path)
+        print("painel binário: {:.1f} ms".format(1000 * seconds))
+        _, seconds = timed(window_sum, stored)
+        print("janela de um ano do painel binário: {:.1f} ms".format(1000 * seconds))
+        print("painéis iguais:", stored.equals(prices))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
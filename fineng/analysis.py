@@ -1,6 +1,4 @@
-from copy import deepcopy
 import datetime
-import statistics
 
 import numpy as np
 import pandas as pd
@@ -9,6 +7,7 @@ import plotly.graph_objects as go
 import plotly.io as pio
 
 import fineng.calculation as calc
+from fineng.weights import WeightMatrix
 
 
 def analyse_log(log_path):
@@ -58,7 +57,7 @@ def plot_strategy(strategy_list):
     fig = go.Figure()
     # Calcula o retorno acumulado de cada estratégia e plota seu gráfico
     for s in strategy_list:
-        ret = deepcopy(s.strategy_ret).loc[min_date:max_date]
+        ret = s.strategy_ret.loc[min_date:max_date]
         cumulative_return = calc.cum_ret(ret)
         fig.add_trace(
             go.Scatter(
@@ -87,7 +86,7 @@ def analyse_strategy(strategy, benchmark, days_back=0, show_weight=True):
 
     min_date = strategy.strategy_ret.index[0]
     max_date = strategy.strategy_ret.index[-1]
-    benchmark.strategy_ret = deepcopy(benchmark).strategy_ret.loc[min_date:max_date]
+    benchmark.strategy_ret = benchmark.strategy_ret.loc[min_date:max_date]
 
     # Se valor default é deixado, pega a maior quantidade de dias possível
     if days_back <= 0:
@@ -150,8 +149,8 @@ def compare_strategies(list_of_strategies, benchmark, days_back=0, display_table
 
     # Padronizar o range de todas estratégias
     for s in list_of_strategies:
-        s.strategy_ret = deepcopy(s.strategy_ret).loc[min_date:max_date]
-    benchmark.strategy_ret = deepcopy(benchmark.strategy_ret).loc[min_date:max_date]
+        s.strategy_ret = s.strategy_ret.loc[min_date:max_date]
+    benchmark.strategy_ret = benchmark.strategy_ret.loc[min_date:max_date]
 
     # Se valor default é deixado, pega a maior quantidade de dias possível
     if days_back <= 0:
@@ -212,7 +211,7 @@ def plot_rolling_vol(strategy_list):
     fig = go.Figure()
     # Calcula o retorno acumulado de cada estratégia e plota seu gráfico
     for s in strategy_list:
-        ret = deepcopy(s.strategy_ret).loc[min_date:max_date]
+        ret = s.strategy_ret.loc[min_date:max_date]
         rolling_sharpe = ret.rolling(252).apply(calc.vol_annual, raw=False)
         rolling_sharpe = rolling_sharpe.dropna()
         fig.add_trace(
@@ -247,7 +246,7 @@ def plot_rolling_ret(strategy_list):
     fig = go.Figure()
     # Calcula o retorno acumulado de cada estratégia e plota seu gráfico
     for s in strategy_list:
-        ret = deepcopy(s.strategy_ret).loc[min_date:max_date]
+        ret = s.strategy_ret.loc[min_date:max_date]
         rolling_sharpe = ret.rolling(252).apply(calc.ret_annual, raw=False)
         rolling_sharpe = rolling_sharpe.dropna()
         fig.add_trace(
@@ -282,7 +281,7 @@ def plot_rolling_cvar(strategy_list):
     fig = go.Figure()
     # Calcula o retorno acumulado de cada estratégia e plota seu gráfico
     for s in strategy_list:
-        ret = deepcopy(s.strategy_ret).loc[min_date:max_date]
+        ret = s.strategy_ret.loc[min_date:max_date]
         rolling_sharpe = ret.rolling(252).apply(calc.cvar, args=tuple(5), raw=False)
         rolling_sharpe = rolling_sharpe.dropna()
         fig.add_trace(
@@ -317,7 +316,7 @@ def plot_rolling_sharpe(strategy_list):
     fig = go.Figure()
     # Calcula o retorno acumulado de cada estratégia e plota seu gráfico
     for s in strategy_list:
-        ret = deepcopy(s.strategy_ret).loc[min_date:max_date]
+        ret = s.strategy_ret.loc[min_date:max_date]
         rolling_sharpe = ret.rolling(252).apply(calc.sharpe, raw=False)
         rolling_sharpe = rolling_sharpe.dropna()
         fig.add_trace(
@@ -336,7 +335,7 @@ def plot_rolling_sharpe(strategy_list):
 def plot_daily_drawdown(strategy):
     """Plota gŕafico do Daily Drawdown"""
 
-    df = deepcopy(strategy.strategy_cumret)
+    df = strategy.strategy_cumret
 
     # Calcula o valor máximo em uma janela de 252 dias
     roll_max = df.rolling(center=False, min_periods=1, window=252).max()
@@ -386,21 +385,10 @@ class StrategyStats:
         self.starr = calc.starr(rets, 5)
         self.max_dd = calc.max_dd(rets)
 
-        turnover_list = []
-        size_list = []
-
-        if "quantfin.strategy.Strategy" in str(type(strategy)):
-            weights = deepcopy(strategy.strategy_weights)
-            weights.fillna(0, inplace=True)
-            for i, row in enumerate(weights.iterrows()):
-                size = row[1][row[1] > 0.00001].size
-                size_list.append(size)
-                if i >= 1:
-                    turnover = weights.iloc[i, :] - weights.iloc[i - 1, :]
-                    turnover = turnover[turnover > 0].sum()
-                    turnover_list.append(turnover)
-            self.turnover = statistics.mean(turnover_list)
-            self.size = statistics.mean(size_list)
+        weights = getattr(strategy, "weights", None)
+        if isinstance(weights, WeightMatrix):
+            self.turnover = weights.turnover().mean() if len(weights) > 1 else 0
+            self.size = weights.holdings(0.00001).mean()
         else:
             self.turnover = 0
             self.size = 0
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+class ResultCache:
+    def __init__(self, path="cache", max_size=2**30):
+        """Cache em disco dos resultados de otimização de cada janela, endereçado pelo conteúdo:
+        a chave é o hash dos retornos in-sample e de todos os parâmetros que afetam a otimização.
+        Quando o tamanho total passa de max_size, os resultados usados há mais tempo são removidos até
+        o cache ocupar no máximo 90% de max_size, para que a pasta não seja percorrida a cada resultado novo.
+        Pode ser compartilhado entre processos e execuções, já que cada resultado é um arquivo; cada instância
+        soma apenas o que ela própria gravou desde a última varredura, então com vários processos o cache pode
+        passar um pouco de max_size entre as varreduras.
+
+        Keyword Arguments:
+            path {str} -- Pasta do cache (default: {'cache'})
+            max_size {int} -- Tamanho máximo em bytes (default: {1 GB})
+        """
+        self.path = path
+        self.max_size = max_size
+        os.makedirs(path, exist_ok=True)
+
+        # Tamanho estimado da pasta: medido em evict e acrescido a cada put (None até a primeira varredura)
+        self.size = None
+
+    def key(self, rets, *params):
+        """Calcula a chave de uma janela
+
+        Arguments:
+            rets {DataFrame} -- Retornos in-sample da janela
+            *params -- Parâmetros que afetam a otimização (método, limites, argumentos extras...)
+
+        Returns:
+            str -- Hash SHA-256 em hexadecimal
+        """
+        digest = hashlib.sha256()
+        for value in (rets,) + params:
+            _update(digest, value)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Busca um resultado no cache, marcando-o como usado recentemente
+
+        Arguments:
+            key {str} -- Chave da janela
+
+        Returns:
+            object -- Resultado armazenado, ou None se não existir
+        """
+        file_path = os.path.join(self.path, key + ".pickle")
+        try:
+            with open(file_path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(file_path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return value
+
+    def put(self, key, value):
+        """Armazena um resultado no cache e remove os mais antigos se o tamanho máximo for excedido
+
+        Arguments:
+            key {str} -- Chave da janela
+            value {object} -- Resultado (precisa ser serializável com pickle)
+        """
+        # Escreve em um arquivo temporário e renomeia, para que outro processo nunca leia um arquivo pela metade
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            written = f.tell()
+        os.replace(tmp_path, os.path.join(self.path, key + ".pickle"))
+
+        # A pasta só é percorrida quando o tamanho estimado passa de max_size
+        if self.size is not None:
+            self.size += written
+        if self.size is None or self.size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        """Mede o tamanho da pasta e remove os resultados usados há mais tempo até o cache ocupar
+        no máximo 90% de max_size, se max_size for excedido"""
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".pickle"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_size:
+            for _, size, file_path in sorted(entries):
+                if total <= 0.9 * self.max_size:
+                    break
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        self.size = total
+
+    def clear(self):
+        """Remove todos os resultados do cache"""
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".pickle"):
+                os.remove(entry.path)
+        self.size = 0
+
+
+def _update(digest, value):
+    """Acrescenta um valor ao hash. Tabelas e arrays entram pelos seus bytes, e não pela representação em texto"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(type(value).__name__.encode())
+        _update(digest, list(value.index))
+        if isinstance(value, pd.DataFrame):
+            _update(digest, list(value.columns))
+        _update(digest, value.values)
+    elif isinstance(value, np.ndarray) and value.dtype.hasobject:
+        _update(digest, value.tolist())
+    elif isinstance(value, np.ndarray):
+        digest.update(str((value.dtype, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        digest.update(b"dict")
+        for k in sorted(value, key=repr):
+            _update(digest, k)
+            _update(digest, value[k])
+    elif isinstance(value, (list, tuple)):
+        digest.update(type(value).__name__.encode() + str(len(value)).encode())
+        for item in value:
+            _update(digest, item)
+    else:
+        digest.update(repr(value).encode())
+    digest.update(b";")
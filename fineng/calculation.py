@@ -2,6 +2,7 @@ from copy import deepcopy
 import pandas as pd
 import numpy as np
 from fineng.utils import same_index
+from fineng.weights import WeightMatrix
 
 
 def cum_ret(rets):
@@ -65,6 +66,66 @@ def cvar(p_rets, var_level, return_var=False):
         return cvar_value, var_value
 
 
+def cvar_levels(p_rets, var_levels, return_var=False):
+    """Calcula o CVar em vários níveis a partir de uma única ordenação dos retornos.
+    Os valores são os mesmos de cvar() chamada nível a nível.
+
+    Arguments:
+        p_rets {Series} -- Retornos
+        var_levels {list} -- Percentis do VaR
+
+    Keyword Arguments:
+        return_var {bool} -- Se True, também retorna o VaR de cada nível (default: {False})
+
+    Returns:
+        array -- CVar de cada nível
+    """
+    sorted_rets = np.sort(np.asarray(p_rets, dtype=float))
+    var_values = var_sorted(sorted_rets, var_levels)
+
+    # Quantidade de retornos menores ou iguais ao VaR de cada nível
+    counts = np.searchsorted(sorted_rets, var_values, side="right")
+    cvar_values = np.cumsum(sorted_rets)[counts - 1] / counts
+    if return_var == False:
+        return cvar_values
+    else:
+        return cvar_values, var_values
+
+
+def var_sorted(sorted_rets, var_levels):
+    """Calcula o VaR em vários níveis (interpolação linear, como np.percentile) sobre retornos já ordenados"""
+    position = (sorted_rets.size - 1) * np.asarray(var_levels, dtype=float) / 100
+    lower = np.floor(position).astype(int)
+    upper = np.minimum(lower + 1, sorted_rets.size - 1)
+    return sorted_rets[lower] + (sorted_rets[upper] - sorted_rets[lower]) * (
+        position - lower
+    )
+
+
+class TailProfile:
+    def __init__(self, p_rets, var_levels):
+        """Perfil de cauda de uma série fixa (ex: o mercado numa janela), com VaR e CVar
+        de todos os níveis calculados uma única vez
+
+        Arguments:
+            p_rets {Series} -- Retornos
+            var_levels {list} -- Percentis do VaR
+        """
+        self.var_levels = list(var_levels)
+        self.cvar, self.var = cvar_levels(p_rets, self.var_levels, return_var=True)
+
+    def cvar_at(self, var_level):
+        """Retorna o CVar pré-calculado de um nível
+
+        Arguments:
+            var_level {float} -- Percentil do VaR
+
+        Returns:
+            float -- CVar
+        """
+        return self.cvar[self.var_levels.index(var_level)]
+
+
 def starr(p_rets, var_level):
     return ret_annual(p_rets) / cvar(p_rets, var_level)
 
@@ -84,3 +145,50 @@ def max_dd(p_rets):
     ).min()
 
     return max(abs(max_daily_draw_down))
+
+
+def simulate_weights(rets, weights, share=1):
+    """Simula a cota de uma carteira comprada e mantida em cada período, com os pesos de cada linha
+    de weights aplicados sobre o valor da cota no fim do período anterior. Cada período é calculado
+    com um produto acumulado sobre o bloco de retornos das ações na carteira, sem percorrer os dias um a um.
+
+    Arguments:
+        rets {DataFrame} -- Retornos diários (dias x ações)
+        weights {WeightMatrix} -- Pesos de cada período. Também aceita o DataFrame com index no formato 'data_inicial/data_final'
+
+    Keyword Arguments:
+        share {float} -- Valor da cota no início do primeiro período (default: {1})
+
+    Returns:
+        Series -- Valor da cota em cada dia
+    """
+    if isinstance(weights, pd.DataFrame):
+        weights = WeightMatrix.from_frame(weights)
+
+    index = np.asarray(rets.index)
+    days = index.astype("datetime64[D]")
+    columns = rets.columns.get_indexer(weights.assets)
+    panel = np.asarray(rets, dtype=float)
+
+    dates, values = [], []
+    for i in range(len(weights)):
+        first, last = np.searchsorted(days, [weights.starts[i], weights.ends[i]])
+        if first == last:
+            continue
+        positions, row = weights.held(i)
+        positions = columns[positions]
+        present = positions >= 0
+
+        # A primeira linha é a posição inicial em cada ação; o produto acumulado aplica os retornos dia a dia
+        growth = panel[first:last, positions[present]]
+        growth = 1 + np.where(np.isnan(growth), 0, growth)
+        path = np.cumprod(np.vstack([row[present] * share, growth]), axis=0)[1:]
+        period_values = np.nansum(path, axis=1)
+
+        # Ao final, é salvo o valor da cota para ser utilizado no próximo período
+        share = period_values[-1]
+        dates.extend(index[first:last])
+        values.extend(period_values)
+
+    calculated_ret = pd.Series(values, index=dates, dtype=float)
+    return calculated_ret[~calculated_ret.index.duplicated(keep="last")]
@@ -0,0 +1,145 @@
+import numpy as np
+
+
+class FactorCovariance:
+    def __init__(self, loadings, specific):
+        """Covariância de baixo posto mais diagonal: cov = B B' + diag(D).
+        Produtos com pesos custam O(N * k) em vez de O(N²), e a matriz N x N nunca é montada,
+        a não ser que seja pedida explicitamente (to_dense ou np.asarray).
+
+        Arguments:
+            loadings {array} -- Matriz B (ações x fatores) de exposições aos fatores
+            specific {array} -- Variância específica D de cada ação
+        """
+        self.loadings = loadings
+        self.specific = specific
+        self.shape = (specific.size, specific.size)
+
+    def dot(self, weights):
+        """Calcula cov * w
+
+        Arguments:
+            weights {array} -- Pesos
+
+        Returns:
+            array -- Produto da covariância pelos pesos
+        """
+        return self.loadings.dot(self.loadings.T.dot(weights)) + self.specific * weights
+
+    def diagonal(self):
+        """Retorna a variância de cada ação"""
+        return (self.loadings**2).sum(axis=1) + self.specific
+
+    def to_dense(self):
+        """Monta a matriz de covariância N x N"""
+        return self.loadings.dot(self.loadings.T) + np.diag(self.specific)
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        return dense if dtype is None else dense.astype(dtype)
+
+
+def sample(rets):
+    """Covariância amostral
+
+    Arguments:
+        rets {dataframe} -- Tabela com retornos
+
+    Returns:
+        array -- Matriz de covariância
+    """
+    return np.cov(np.asarray(rets, dtype=float), rowvar=False)
+
+
+def ledoit_wolf(rets):
+    """Covariância com shrinkage de Ledoit-Wolf em direção à identidade escalada pela variância média.
+    A intensidade do shrinkage é a ótima estimada a partir dos próprios dados.
+
+    Arguments:
+        rets {dataframe} -- Tabela com retornos
+
+    Returns:
+        array -- Matriz de covariância
+    """
+    rets = np.asarray(rets, dtype=float)
+    days, noa = rets.shape
+    centered = rets - rets.mean(axis=0)
+    emp_cov = centered.T.dot(centered) / days
+    mu = np.trace(emp_cov) / noa
+
+    # Distância da amostral até o alvo e variância da estimativa amostral
+    delta = ((emp_cov - mu * np.eye(noa)) ** 2).sum() / noa
+    squared = centered**2
+    beta = ((squared.T.dot(squared) / days - emp_cov**2).sum()) / (noa * days)
+    shrinkage = 0 if delta == 0 else min(beta, delta) / delta
+
+    return (1 - shrinkage) * emp_cov + shrinkage * mu * np.eye(noa)
+
+
+def ewma(rets, decay=0.94):
+    """Covariância com média móvel exponencial, dando mais importância aos dias mais recentes
+
+    Arguments:
+        rets {dataframe} -- Tabela com retornos
+
+    Keyword Arguments:
+        decay {float} -- Fator de decaimento por dia (default: {0.94})
+
+    Returns:
+        array -- Matriz de covariância
+    """
+    rets = np.asarray(rets, dtype=float)
+    weights = decay ** np.arange(rets.shape[0] - 1, -1, -1)
+    weights = weights / weights.sum()
+    centered = rets - weights.dot(rets)
+    return (centered * weights[:, None]).T.dot(centered)
+
+
+def pca_factor(rets, n_factors=5):
+    """Modelo de fatores estatísticos: os k primeiros componentes principais explicam a covariância comum
+    e o restante da variância de cada ação fica na diagonal. Calculado pela SVD dos retornos (dias x ações),
+    sem montar a matriz amostral N x N.
+
+    Arguments:
+        rets {dataframe} -- Tabela com retornos
+
+    Keyword Arguments:
+        n_factors {int} -- Quantidade de fatores (default: {5})
+
+    Returns:
+        FactorCovariance -- Covariância de baixo posto mais diagonal
+    """
+    rets = np.asarray(rets, dtype=float)
+    centered = (rets - rets.mean(axis=0)) / np.sqrt(rets.shape[0] - 1)
+    _, singular, components = np.linalg.svd(centered, full_matrices=False)
+    loadings = components[:n_factors].T * singular[:n_factors]
+
+    # A variância específica é o que sobra da variância amostral de cada ação
+    specific = (centered**2).sum(axis=0) - (loadings**2).sum(axis=1)
+    return FactorCovariance(loadings, np.maximum(specific, 0))
+
+
+ESTIMATORS = {
+    "sample": sample,
+    "ledoit_wolf": ledoit_wolf,
+    "ewma": ewma,
+    "pca": pca_factor,
+}
+
+
+def estimate(rets, method="sample", args=None):
+    """Estima a covariância de uma janela de retornos
+
+    Arguments:
+        rets {dataframe} -- Tabela com retornos
+
+    Keyword Arguments:
+        method {str} -- Estimador: 'sample', 'ledoit_wolf', 'ewma' ou 'pca' (default: {'sample'})
+        args {dict} -- Argumentos extras do estimador, ex: {'n_factors': 10} (default: {None})
+
+    Returns:
+        array ou FactorCovariance -- Covariância
+    """
+    if method not in ESTIMATORS:
+        raise ValueError("Invalid covariance method: {}".format(method))
+    return ESTIMATORS[method](rets, **(args or {}))
@@ -4,65 +4,109 @@ import pandas as pd
 import pandas_datareader.data as web
 import pickle
 
+from fineng.executor import Executor
+import fineng.store as store
 from fineng.utils import printProgressBar, log
 
 
-def merge_csv_to_df():
-    """Une os CSV's de ações na pasta para um mesmo DataFrame
+def merge_csv_to_df(
+    path=os.path.join("dataset", "stocks"),
+    threads=os.cpu_count(),
+    executor="threads",
+    return_dates=False,
+):
+    """Une os CSV's de ações na pasta para um mesmo DataFrame. Cada arquivo é lido uma única vez,
+    apenas com as colunas de data e fechamento, em paralelo, e o painel é montado com um único concat
+
+    Keyword Arguments:
+        path {str} -- Pasta dos CSV's, um por ação (default: {'dataset/stocks'})
+        threads {int} -- Quantidade de threads ou processos de leitura (default: {os.cpu_count()})
+        executor {str} -- 'threads', 'processes' ou 'serial' (ver executor.Executor) (default: {'threads'})
+        return_dates {bool} -- Se True, também retorna a primeira e a última data de cada ação (default: {False})
 
     Returns:
-        DataFrame -- Pandas Dataframe com os dados
+        DataFrame -- Pandas Dataframe com os fechamentos (datas x ações)
+        DataFrame -- Primeira e última data de cada ação, apenas se return_dates for True
     """
 
-    # Lista todos arquivos na pasta dataset/stocks
-    list_of_csvs = os.listdir(os.path.join("dataset", "stocks"))
-
-    # Cria lista vazias
-    last_row_date = []
-    first_row_date = []
-
-    # Checa todos arquivos de CSV
-    for n, company in enumerate(list_of_csvs):
-        # Na primeira iteração cria a variável prices
-        if n == 0:
-            prices = pd.DataFrame(
-                index=pd.read_csv(os.path.join("dataset", "stocks", company))[
-                    "Unnamed: 0"
-                ]
-            )
-
-        # Lê cada ação e seleciona sua coluna de fechamentos
-        company_data = pd.read_csv(os.path.join("dataset", "stocks", company))
-        ticker = company[:-4]
-
-        # Se o arquivo está vazio, a ação é pulada
-        if company_data.empty:
-            pass
-
-        # Se contém preços, salva no arquivo prices a coluna com o nome da ação.
-        else:
-            last_row_date.append(company_data.loc[company_data.index[-1]]["Unnamed: 0"])
-            first_row_date.append(company_data.loc[0]["Unnamed: 0"])
-            company_data.rename(columns={"close": ticker}, inplace=True)
-            company_data.drop(
-                [
-                    "open",
-                    "high",
-                    "low",
-                    "volume_dollar",
-                    "volume_shares",
-                    "volume_ticks",
-                    "avg",
-                ],
-                1,
-                inplace=True,
-            )
-            company_data.set_index("Unnamed: 0", drop=True, inplace=True)
-            del company_data.index.name
-            prices = prices.join(company_data, how="outer")
+    # Lista todos arquivos na pasta
+    list_of_csvs = os.listdir(path)
+    with Executor(executor, threads) as pool:
+        closes = pool.map(
+            read_close, [os.path.join(path, company) for company in list_of_csvs]
+        )
+
+    # Arquivos vazios são pulados
+    closes = [close for close in closes if close is not None]
+    prices = pd.concat(closes, axis=1, sort=True)
+    prices.index.name = None
+
+    dates = pd.DataFrame(
+        {
+            "first_date": [close.index[0] for close in closes],
+            "last_date": [close.index[-1] for close in closes],
+        },
+        index=[close.name for close in closes],
+    )
 
     log("Stock market CSV's merged!")
-    return prices
+    if return_dates == False:
+        return prices
+    else:
+        return prices, dates
+
+
+def csv_to_store(
+    store_path,
+    path=os.path.join("dataset", "stocks"),
+    returns=False,
+    dtype="float64",
+    **kwargs
+):
+    """Converte os CSV's de ações para um painel binário mapeado em memória (ver store.write_store),
+    que é aberto com store.load_store sem ler os CSV's novamente
+
+    Arguments:
+        store_path {str} -- Pasta do painel
+
+    Keyword Arguments:
+        path {str} -- Pasta dos CSV's, um por ação (default: {'dataset/stocks'})
+        returns {bool} -- Se True, grava os retornos diários em vez dos fechamentos (default: {False})
+        dtype {str} -- Tipo dos valores gravados, 'float64' ou 'float32' (default: {'float64'})
+        **kwargs -- Parâmetros de leitura de merge_csv_to_df (threads, executor)
+
+    Returns:
+        DataFrame -- Primeira e última data de cada ação
+    """
+    prices, dates = merge_csv_to_df(path, return_dates=True, **kwargs)
+    if returns:
+        prices = prices.pct_change(fill_method=None)
+    store.write_store(store_path, prices, dtype)
+    log("Stock market CSV's saved in store {}".format(store_path))
+    return dates
+
+
+def read_close(file_path):
+    """Lê os fechamentos de uma ação, sem carregar as demais colunas do CSV
+
+    Arguments:
+        file_path {str} -- Caminho do CSV, com o código da ação no nome
+
+    Returns:
+        Series -- Fechamentos, com o nome da ação (None se o arquivo estiver vazio)
+    """
+    try:
+        company_data = pd.read_csv(
+            file_path,
+            usecols=["Unnamed: 0", "close"],
+            dtype={"Unnamed: 0": str, "close": float},
+            index_col="Unnamed: 0",
+        )
+    except pd.errors.EmptyDataError:
+        return None
+    if company_data.empty:
+        return None
+    return company_data["close"].rename(os.path.basename(file_path)[:-4])
 
 
 def get_sp500(symbol="^GSPC"):
@@ -83,7 +127,6 @@ def get_sp500(symbol="^GSPC"):
     return df.iloc[1:]
 
 
-
 def save_to_pickle(path, variables):
     """Salva variáveis em arquivo .pickle
 
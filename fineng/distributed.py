@@ -0,0 +1,322 @@
+import json
+import os
+import pickle
+import socket
+import sqlite3
+import sys
+import time
+
+import fineng.shared as shared
+from fineng.sweep import prepare, task_cost
+from fineng.utils import log
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS panel (id INTEGER PRIMARY KEY, rets BLOB);
+CREATE TABLE IF NOT EXISTS strategies (id INTEGER PRIMARY KEY, name TEXT, strategy BLOB);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    strategy INTEGER,
+    position INTEGER,
+    dates TEXT,
+    cost REAL,
+    status TEXT DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER DEFAULT 0,
+    result BLOB
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, cost);
+"""
+
+
+class JobQueue:
+    def __init__(self, path, lease=3600, timeout=60):
+        """Fila de tarefas (estratégia, janela) em um banco SQLite. Um worker reserva uma tarefa por
+        lease segundos; se não entregar o resultado nesse prazo (ex: o computador caiu), a tarefa volta
+        para a fila. Os prazos usam o relógio de cada computador, que precisam estar sincronizados.
+        O travamento do SQLite depende do sistema de arquivos: em pastas de rede, use um que suporte
+        locks de arquivo (ex: NFSv4)
+
+        Arguments:
+            path {str} -- Caminho do banco
+
+        Keyword Arguments:
+            lease {float} -- Prazo de cada reserva, em segundos. Deve ser maior que a janela mais demorada (default: {3600})
+            timeout {float} -- Espera máxima por um lock do banco, em segundos (default: {60})
+        """
+        self.path = path
+        self.lease = lease
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.connection.executescript(SCHEMA)
+
+    def submit(self, rets, strategies):
+        """Grava os retornos, as estratégias sem pesos e uma tarefa por janela de cada estratégia
+
+        Arguments:
+            rets {DataFrame} -- Retornos, gravados uma única vez para todas as estratégias
+            strategies {list} -- Estratégias sem pesos (Strategy com run=False)
+        """
+        if self.connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]:
+            raise ValueError("Queue {} already has tasks".format(self.path))
+
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            self.connection.execute(
+                "INSERT INTO panel (id, rets) VALUES (0, ?)", (_dumps(rets),)
+            )
+            for i, strategy in enumerate(strategies):
+                # As estratégias são gravadas sem os retornos, que vêm do painel em cada worker
+                strategy.share_returns(True)
+                try:
+                    payload = _dumps(strategy)
+                finally:
+                    strategy.share_returns(False)
+                self.connection.execute(
+                    "INSERT INTO strategies (id, name, strategy) VALUES (?, ?, ?)",
+                    (i, strategy.name, payload),
+                )
+                self.connection.executemany(
+                    "INSERT INTO tasks (strategy, position, dates, cost) VALUES (?, ?, ?, ?)",
+                    [
+                        (i, j, json.dumps(dates), task_cost(strategy.method, dates))
+                        for j, dates in enumerate(strategy.list_of_dates)
+                    ],
+                )
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    def claim(self, worker):
+        """Reserva a tarefa pendente mais demorada, ou uma tarefa cuja reserva expirou
+
+        Arguments:
+            worker {str} -- Identificação do worker
+
+        Returns:
+            tuple -- Id da tarefa, id da estratégia e datas da janela (None se não houver tarefa disponível)
+        """
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.connection.execute(
+                "SELECT id, strategy, dates FROM tasks WHERE status = 'pending' "
+                "OR (status = 'running' AND lease_until < ?) ORDER BY cost DESC, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is not None:
+                self.connection.execute(
+                    "UPDATE tasks SET status = 'running', worker = ?, lease_until = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (worker, now + self.lease, row[0]),
+                )
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def complete(self, task_id, result):
+        """Grava o resultado de uma tarefa. Se a tarefa já foi concluída por outro worker depois de
+        a reserva expirar, o resultado repetido é descartado
+
+        Arguments:
+            task_id {int} -- Id da tarefa
+            result {tuple} -- Resultado de Strategy.calculate_weights
+        """
+        self.connection.execute(
+            "UPDATE tasks SET status = 'done', result = ? WHERE id = ? AND status != 'done'",
+            (_dumps(result), task_id),
+        )
+
+    def progress(self):
+        """Quantidade de tarefas em cada situação
+
+        Returns:
+            dict -- Tarefas 'pending', 'running' e 'done'
+        """
+        counts = dict.fromkeys(("pending", "running", "done"), 0)
+        counts.update(
+            self.connection.execute(
+                "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+            ).fetchall()
+        )
+        return counts
+
+    def finished(self):
+        """True quando todas as tarefas foram concluídas"""
+        progress = self.progress()
+        return progress["pending"] == 0 and progress["running"] == 0
+
+    def panel(self):
+        """Retorna os retornos gravados em submit"""
+        row = self.connection.execute("SELECT rets FROM panel WHERE id = 0").fetchone()
+        return pickle.loads(row[0])
+
+    def strategy(self, strategy_id):
+        """Retorna uma estratégia sem pesos. Os retornos vêm do painel aberto no processo (ver shared.attach)
+
+        Arguments:
+            strategy_id {int} -- Id da estratégia
+
+        Returns:
+            Strategy -- Estratégia
+        """
+        row = self.connection.execute(
+            "SELECT strategy FROM strategies WHERE id = ?", (strategy_id,)
+        ).fetchone()
+        return pickle.loads(row[0])
+
+    def results(self, strategy_id):
+        """Retorna os resultados das janelas de uma estratégia, na ordem de list_of_dates
+
+        Arguments:
+            strategy_id {int} -- Id da estratégia
+
+        Returns:
+            list -- Pesos e telemetria de cada janela
+        """
+        rows = self.connection.execute(
+            "SELECT result FROM tasks WHERE strategy = ? ORDER BY position",
+            (strategy_id,),
+        ).fetchall()
+        return [pickle.loads(row[0]) for row in rows]
+
+    def close(self):
+        """Fecha a conexão com o banco"""
+        self.connection.close()
+
+
+def distribute(path, rets, grid, log_path="log.csv", **kwargs):
+    """Coordenador: grava na fila uma tarefa por janela de cada combinação da grade (ver sweep.sweep)
+
+    Arguments:
+        path {str} -- Caminho do banco da fila
+        rets {DataFrame} -- Retornos
+        grid {dict} -- Valores de cada parâmetro de Strategy, ex: {'method': ['max_sharpe', 'min_vol'], 'time_is': [6, 12]}
+
+    Keyword Arguments:
+        log_path {str} -- Caminho do log (default: {'log.csv'})
+        **kwargs -- Parâmetros de Strategy comuns a todas as configurações
+
+    Returns:
+        int -- Quantidade de tarefas
+    """
+    strategies = prepare(rets, grid, log_path, **kwargs)
+    tasks = sum(len(s.list_of_dates) for s in strategies)
+    log("start", "Submitting {} windows to {}".format(tasks, path), 8, log_path)
+    queue = JobQueue(path)
+    try:
+        queue.submit(rets, strategies)
+    finally:
+        queue.close()
+    log("finish", "Submitting {} windows to {}".format(tasks, path), 8, log_path)
+    return tasks
+
+
+def work(path, worker=None, lease=3600, poll=5):
+    """Worker: executa tarefas da fila até que todas estejam concluídas. Os retornos são lidos uma vez
+    e o pré-processamento de cada janela é reaproveitado entre estratégias (ver shared.cached)
+
+    Arguments:
+        path {str} -- Caminho do banco da fila
+
+    Keyword Arguments:
+        worker {str} -- Identificação do worker (default: {None}, 'computador:pid')
+        lease {float} -- Prazo de cada reserva, em segundos (default: {3600})
+        poll {float} -- Espera entre consultas quando não há tarefa disponível, em segundos (default: {5})
+
+    Returns:
+        int -- Quantidade de tarefas executadas por este worker
+    """
+    worker = worker or "{}:{}".format(socket.gethostname(), os.getpid())
+    queue = JobQueue(path, lease=lease)
+    shared.attach(queue.panel())
+    strategies = {}
+    done = 0
+    try:
+        while True:
+            task = queue.claim(worker)
+            if task is None:
+                # Tarefas reservadas por outros workers podem voltar para a fila se a reserva expirar
+                if queue.finished():
+                    break
+                time.sleep(poll)
+                continue
+
+            task_id, strategy_id, dates = task
+            if strategy_id not in strategies:
+                strategies[strategy_id] = queue.strategy(strategy_id)
+            strategy = strategies[strategy_id]
+
+            # Uma exceção em uma janela é registrada na telemetria, sem interromper o worker
+            try:
+                portfolio, telemetry = strategy.calculate_weights(dates)
+            except Exception as e:
+                log("Error ocurred in calculation of period {}: {!r}".format(dates, e))
+                portfolio = None
+                telemetry = {
+                    "success": False,
+                    "error": repr(e),
+                    "period": str(dates[2]) + "/" + str(dates[3]),
+                    "method": strategy.method,
+                }
+            telemetry["worker"] = worker
+            queue.complete(task_id, (portfolio, telemetry))
+            done += 1
+    finally:
+        shared.detach()
+        queue.close()
+    return done
+
+
+def collect(path, poll=5, timeout=None):
+    """Coordenador: espera todas as tarefas terminarem e monta as estratégias com os resultados
+
+    Arguments:
+        path {str} -- Caminho do banco da fila
+
+    Keyword Arguments:
+        poll {float} -- Espera entre consultas, em segundos (default: {5})
+        timeout {float} -- Espera máxima, em segundos (default: {None}, sem limite)
+
+    Returns:
+        list -- Estratégias, uma por configuração, no formato aceito por analysis.compare_strategies
+    """
+    queue = JobQueue(path)
+    try:
+        start = time.time()
+        while not queue.finished():
+            if timeout is not None and time.time() - start > timeout:
+                raise TimeoutError(
+                    "Queue {} not finished: {}".format(path, queue.progress())
+                )
+            time.sleep(poll)
+
+        ids = [
+            row[0]
+            for row in queue.connection.execute("SELECT id FROM strategies ORDER BY id")
+        ]
+        shared.attach(queue.panel())
+        try:
+            strategies = [queue.strategy(i) for i in ids]
+        finally:
+            shared.detach()
+        for strategy_id, strategy in zip(ids, strategies):
+            strategy.share_returns(False)
+            strategy.assemble(queue.results(strategy_id))
+    finally:
+        queue.close()
+    return strategies
+
+
+def _dumps(value):
+    """Serializa um valor para gravar no banco"""
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+if __name__ == "__main__":
+    # Uso: python -m fineng.distributed fila.db [prazo da reserva em segundos]
+    work(sys.argv[1], lease=float(sys.argv[2]) if len(sys.argv) > 2 else 3600)
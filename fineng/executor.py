@@ -0,0 +1,86 @@
+import os
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+from threadpoolctl import threadpool_limits
+
+import fineng.shared as shared
+
+EXECUTORS = ("processes", "threads", "serial")
+
+
+class Executor:
+    def __init__(self, backend="processes", workers=1, rets=None):
+        """Executa tarefas em processos, threads ou no próprio processo, com a mesma interface de Pool.
+        Cada worker usa no máximo cpu_count // workers threads de BLAS/OpenMP, para que os workers
+        juntos não ocupem mais núcleos do que a máquina tem. Deve ser usado com 'with'.
+
+        Keyword Arguments:
+            backend {str} -- 'processes', 'threads' ou 'serial' (default: {'processes'})
+            workers {int} -- Quantidade de processos ou threads (default: {1})
+            rets {DataFrame} -- Retornos publicados uma vez para os processos (ver shared.SharedPanel).
+                Threads e o modo serial já compartilham a memória do processo (default: {None})
+        """
+        if backend not in EXECUTORS:
+            raise ValueError("Invalid executor: {}".format(backend))
+        self.backend = backend
+        self.workers = workers
+        self.rets = rets
+        self.blas_threads = max(1, (os.cpu_count() or 1) // workers)
+        self.__pool = None
+        self.__panel = None
+        self.__limits = None
+
+    def __enter__(self):
+        if self.backend == "processes":
+            if self.rets is not None:
+                self.__panel = shared.SharedPanel(self.rets)
+            self.__pool = Pool(
+                self.workers,
+                initializer=init_process,
+                initargs=(self.__panel, self.blas_threads),
+            )
+        elif self.backend == "threads":
+            # Os limites de BLAS valem para o processo inteiro, então são aplicados enquanto o pool existir.
+            # threadpool_limits é usado como gerenciador de contexto, a interface comum às versões 2 e 3
+            self.__limits = threadpool_limits(limits=self.blas_threads).__enter__()
+            self.__pool = ThreadPool(self.workers)
+        return self
+
+    def __exit__(self, *exc):
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool.join()
+        if self.__panel is not None:
+            self.__panel.close()
+        if self.__limits is not None:
+            self.__limits.__exit__(*exc)
+
+    @property
+    def shares_memory(self):
+        """False quando as tarefas são serializadas para outros processos"""
+        return self.backend != "processes"
+
+    def map(self, function, items):
+        """Aplica function a cada item, retornando os resultados na ordem dos itens"""
+        if self.__pool is None:
+            return [function(item) for item in items]
+        return self.__pool.map(function, items)
+
+    def imap_unordered(self, function, items):
+        """Aplica function a cada item, entregando os resultados à medida que terminam"""
+        if self.__pool is None:
+            return (function(item) for item in items)
+        return self.__pool.imap_unordered(function, items)
+
+
+def init_process(panel, blas_threads):
+    """Inicializador dos processos: limita as threads de BLAS/OpenMP e abre o painel compartilhado
+
+    Arguments:
+        panel {SharedPanel} -- Painel publicado pelo processo principal (None se não houver)
+        blas_threads {int} -- Threads de BLAS/OpenMP por processo
+    """
+    threadpool_limits(limits=blas_threads)
+    if panel is not None:
+        shared.attach(panel)
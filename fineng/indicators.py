@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+INDICATORS = {}
+
+
+def register_indicator(name, apply, panel=None):
+    """Registra um indicador, tornando-o disponível no pré-processamento das janelas de Strategy
+
+    Arguments:
+        name {str} -- Nome do indicador
+        apply {function} -- Função apply(rets_is, signal, **params) que recebe os retornos in-sample da janela
+            e o painel do indicador restrito à janela, e retorna os retornos transformados ou filtrados
+
+    Keyword Arguments:
+        panel {function} -- Função panel(rets, **params) que calcula o painel do indicador uma única vez sobre
+            todos os retornos da estratégia. Se None, apply recebe signal = None (default: {None})
+    """
+    INDICATORS[name] = (apply, panel)
+
+
+def ewma_panel(rets, span):
+    """EWMA no sentido inverso do tempo (do último dia para o primeiro) sobre todos os retornos.
+    Dias sem dados entram como zero: eles só afetam os valores de janelas que não contêm esses dias,
+    e essa parte é removida em ewma_apply
+
+    Arguments:
+        rets {DataFrame} -- Retornos
+        span {int} -- Span do EWMA
+
+    Returns:
+        DataFrame -- Painel do EWMA
+    """
+    reverse = rets.iloc[::-1].fillna(0)
+    return reverse.ewm(span=span, adjust=False).mean().iloc[::-1]
+
+
+def ewma_apply(rets_is, signal, span):
+    """EWMA inverso calculado apenas com os dias da janela, a partir do painel de todos os retornos.
+    O painel satisfaz a mesma recursão dentro da janela, então a diferença para o EWMA da janela é a
+    contribuição dos dias posteriores, que decai com (1 - alpha) elevado à distância até o fim da janela
+
+    Arguments:
+        rets_is {DataFrame} -- Retornos in-sample
+        signal {DataFrame} -- Painel do EWMA restrito à janela
+        span {int} -- Span do EWMA
+
+    Returns:
+        DataFrame -- Retornos suavizados
+    """
+    alpha = 2 / (span + 1)
+    decay = (1 - alpha) ** np.arange(len(rets_is) - 1, -1, -1)
+    values = np.asarray(signal, dtype=float)
+    tail = values[-1] - np.asarray(rets_is, dtype=float)[-1]
+    return pd.DataFrame(
+        values - decay[:, None] * tail, index=rets_is.index, columns=rets_is.columns
+    )
+
+
+def rsi_apply(rets_is, signal, n=21 * 4, limit=70):
+    """Remove as ações com RSI acima do limite no último dia da janela. Só os últimos n dias entram
+    no cálculo, então não é preciso calcular as médias móveis da janela inteira
+
+    Arguments:
+        rets_is {DataFrame} -- Retornos in-sample
+        signal {None} -- Não utilizado
+
+    Keyword Arguments:
+        n {int} -- Dias das médias de altas e quedas (default: {84})
+        limit {float} -- RSI máximo (default: {70})
+
+    Returns:
+        DataFrame -- Retornos das ações selecionadas
+    """
+    if len(rets_is) < n:
+        return rets_is.iloc[:, []]
+
+    last = np.asarray(rets_is, dtype=float)[-n:]
+    up = np.where(last > 0, last, 0).mean(axis=0)
+    down = np.abs(np.where(last < 0, last, 0).mean(axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + up / down)
+    return rets_is.iloc[:, rsi < limit]
+
+
+register_indicator("ewma", ewma_apply, panel=ewma_panel)
+register_indicator("rsi", rsi_apply)
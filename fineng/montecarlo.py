@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+from fineng.strategy import Strategy
+from fineng.utils import log, same_index
+
+
+def random_weights(rng, n_portfolios, n_assets, min_w=0, max_w=1):
+    """Sorteia carteiras aleatórias (uniformes no simplex) respeitando os limites de peso.
+    Os pesos acima de max_w são cortados e o excesso é redistribuído entre as demais ações,
+    proporcionalmente ao que cada uma tem acima de min_w, até que nenhuma passe do limite
+
+    Arguments:
+        rng {Generator} -- Gerador de números aleatórios (numpy.random.default_rng)
+        n_portfolios {int} -- Quantidade de carteiras
+        n_assets {int} -- Quantidade de ações
+
+    Keyword Arguments:
+        min_w {float} -- Peso mínimo por ação (default: {0})
+        max_w {float} -- Peso máximo por ação (default: {1})
+
+    Returns:
+        array -- Pesos (carteiras x ações)
+    """
+    if n_assets * min_w > 1 or n_assets * max_w < 1:
+        raise ValueError("Weight limits are infeasible for {} assets".format(n_assets))
+
+    draws = rng.standard_exponential((n_portfolios, n_assets))
+    weights = min_w + (1 - n_assets * min_w) * draws / draws.sum(axis=1, keepdims=True)
+    for _ in range(n_assets):
+        excess = np.maximum(weights - max_w, 0).sum(axis=1, keepdims=True)
+        if np.all(excess <= 1e-12):
+            break
+        weights = np.minimum(weights, max_w)
+        room = np.where(weights < max_w, weights - min_w, 0)
+        total = room.sum(axis=1, keepdims=True)
+        weights += np.where(total > 0, excess * room / np.where(total > 0, total, 1), 0)
+    return np.minimum(weights, max_w)
+
+
+def monte_carlo(
+    rets,
+    n_portfolios=10000,
+    seed=None,
+    market=None,
+    var_level=5,
+    min_w=0,
+    max_w=0.05,
+    return_paths=False,
+    log_path="log.csv",
+    **kwargs
+):
+    """Simula n_portfolios estratégias aleatórias de uma vez. Em cada janela são sorteadas
+    n_portfolios carteiras sobre as ações da janela (as mesmas de Strategy com method='random'),
+    e todas são simuladas no período out-of-sample com um único produto de matrizes.
+    Cada janela usa um gerador próprio derivado de seed, então o resultado é reproduzível.
+    Janelas sem ações ou em que os limites de peso são inviáveis ficam de fora, como em Strategy.
+
+    Arguments:
+        rets {DataFrame} -- Retornos
+
+    Keyword Arguments:
+        n_portfolios {int} -- Quantidade de estratégias aleatórias (default: {10000})
+        seed {int} -- Semente dos geradores (default: {None})
+        market {Series} -- Retornos do mercado, para beta e Treynor (default: {None})
+        var_level {float} -- Percentil do VaR e do CVar (default: {5})
+        min_w {float} -- Peso mínimo por ação (default: {0})
+        max_w {float} -- Peso máximo por ação (default: {0.05})
+        return_paths {bool} -- Se True, também retorna as cotas de cada estratégia (default: {False})
+        log_path {str} -- Caminho do log (default: {'log.csv'})
+        **kwargs -- Demais parâmetros de Strategy (time_is, time_os, date_from, date_to, rsi, ewma...)
+
+    Returns:
+        DataFrame -- Métricas de calculation de cada estratégia (uma linha por estratégia)
+        DataFrame -- Cotas (dias x estratégias), apenas se return_paths for True
+    """
+
+    strategy = Strategy(
+        method="random",
+        name="monte_carlo",
+        rets=rets,
+        min_w=min_w,
+        max_w=max_w,
+        log_path=log_path,
+        run=False,
+        **kwargs
+    )
+    log(
+        "start",
+        "Simulating {} random strategies".format(n_portfolios),
+        3,
+        log_path,
+    )
+
+    index = np.asarray(strategy.rets.index)
+    days = index.astype("datetime64[D]")
+    panel = np.asarray(strategy.rets, dtype=float)
+    seeds = np.random.SeedSequence(seed).spawn(len(strategy.list_of_dates))
+
+    share = np.ones(n_portfolios)
+    dates, paths = [], []
+    for window, seed_sequence in zip(strategy.list_of_dates, seeds):
+        first, last = np.searchsorted(days, np.array(window[2:], dtype="datetime64[D]"))
+        columns = strategy.rets.columns.get_indexer(
+            strategy.in_sample_returns(window).columns
+        )
+        if first == last or columns.size * max_w < 1 or columns.size * min_w > 1:
+            continue
+        weights = random_weights(
+            np.random.default_rng(seed_sequence),
+            n_portfolios,
+            columns.size,
+            min_w,
+            max_w,
+        )
+
+        # Valor de cada ação comprada no início do período, dia a dia; as carteiras são combinações dessas trajetórias
+        growth = panel[first:last, columns]
+        growth = np.cumprod(1 + np.where(np.isnan(growth), 0, growth), axis=0)
+        path = (weights * share[:, None]) @ growth.T
+
+        share = path[:, -1]
+        dates.extend(index[first:last])
+        paths.append(path)
+
+    cumret = pd.DataFrame(np.hstack(paths).T, index=dates)
+    metrics = path_metrics(cumret, market=market, var_level=var_level)
+    log(
+        "finish",
+        "Simulating {} random strategies".format(n_portfolios),
+        3,
+        log_path,
+    )
+    if return_paths:
+        return metrics, cumret
+    return metrics
+
+
+def path_metrics(cumret, market=None, var_level=5):
+    """Calcula as métricas de calculation (as mesmas de analysis.StrategyStats) para várias
+    estratégias de uma vez, a partir das cotas
+
+    Arguments:
+        cumret {DataFrame} -- Cotas (dias x estratégias), partindo de 1
+
+    Keyword Arguments:
+        market {Series} -- Retornos do mercado, para beta e Treynor (default: {None})
+        var_level {float} -- Percentil do VaR e do CVar (default: {5})
+
+    Returns:
+        DataFrame -- Métricas de cada estratégia
+    """
+
+    values = np.asarray(cumret, dtype=float)
+    rets = values / np.vstack([np.ones((1, values.shape[1])), values[:-1]]) - 1
+    n_days = rets.shape[0]
+
+    annual_return = np.prod(rets + 1, axis=0) ** (252 / n_days) - 1
+    volatility = rets.std(axis=0, ddof=1) * np.sqrt(252)
+    negative = np.where(rets < 0, rets, np.nan)
+    down_stdev = np.nanstd(negative, axis=0, ddof=1) * np.sqrt(252)
+    var = np.percentile(rets, var_level, axis=0)
+    cvar = np.nanmean(np.where(rets <= var, rets, np.nan), axis=0)
+
+    # Draw-down em relação ao máximo dos últimos 252 dias
+    roll_max = cumret.rolling(center=False, min_periods=1, window=252).max()
+    max_dd = np.abs(np.min(values / np.asarray(roll_max) - 1.0, axis=0))
+
+    frame = pd.DataFrame(rets, index=cumret.index)
+    metrics = pd.DataFrame(
+        {
+            "annual_return": annual_return,
+            "volatility": volatility,
+            "skew": np.asarray(frame.skew()),
+            "kurtosis": np.asarray(frame.kurtosis()),
+            "sharpe": annual_return / volatility,
+            "sortino": annual_return / (down_stdev * np.sqrt(252)),
+            "cvar": cvar,
+            "var": var,
+            "starr": annual_return / cvar,
+            "max_dd": max_dd,
+        },
+        index=cumret.columns,
+    )
+
+    if market is not None:
+        p_rets, market = same_index(frame, market)
+        p_rets = np.asarray(p_rets, dtype=float)
+        market = np.asarray(market, dtype=float)
+        market = market - market.mean()
+        cov = (p_rets - p_rets.mean(axis=0)).T @ market / (market.size - 1)
+        beta = cov / (market @ market / (market.size - 1))
+        treynor = (np.prod(p_rets + 1, axis=0) ** (252 / p_rets.shape[0]) - 1) / beta
+        metrics.insert(4, "beta", beta)
+        metrics.insert(6, "treynor", treynor)
+    return metrics
@@ -1,6 +1,123 @@
 import numpy as np
 import pandas as pd
 import fineng.calculation as calc
+import fineng.covariance as covar
+
+
+class Moments:
+    def __init__(
+        self,
+        rets,
+        annualization="arithmetic",
+        covariance="sample",
+        covariance_args=None,
+    ):
+        """Pré-calcula os momentos de uma janela de retornos para avaliar objetivos de média-variância
+        diretamente em arrays NumPy, sem reconstruir a matriz de retornos ponderados a cada chamada.
+
+        Arguments:
+            rets {dataframe} -- Tabela com retornos da janela
+
+        Keyword Arguments:
+            annualization {str} -- 'arithmetic' anualiza o retorno médio (252 * w'mu).
+                'geometric' mantém o retorno composto utilizado por calc.ret_annual (default: {'arithmetic'})
+            covariance {str} -- Estimador da covariância, ver fineng.covariance (default: {'sample'})
+            covariance_args {dict} -- Argumentos extras do estimador (default: {None})
+        """
+        if annualization not in ("arithmetic", "geometric"):
+            raise ValueError("Invalid annualization: {}".format(annualization))
+
+        rets = np.asarray(rets, dtype=float)
+        self.annualization = annualization
+        self.size = rets.shape[0]
+        self.mean = rets.mean(axis=0)
+        self.cov = covar.estimate(rets, covariance, covariance_args)
+
+        # O retorno composto precisa da série completa de retornos brutos
+        self.gross = 1 + rets if annualization == "geometric" else None
+
+    def ret(self, weights):
+        """Calcula o retorno anualizado do portfólio
+
+        Arguments:
+            weights {array} -- Pesos
+
+        Returns:
+            float -- Retorno
+        """
+        if self.annualization == "arithmetic":
+            return 252 * self.mean.dot(weights)
+
+        return np.prod(self.gross.dot(weights)) ** (252 / self.size) - 1
+
+    def ret_grad(self, weights):
+        """Calcula o gradiente do retorno anualizado do portfólio
+
+        Arguments:
+            weights {array} -- Pesos
+
+        Returns:
+            array -- Gradiente do retorno
+        """
+        if self.annualization == "arithmetic":
+            return 252 * self.mean
+
+        gross = self.gross.dot(weights)
+        exponent = 252 / self.size
+        return (
+            exponent
+            * np.prod(gross) ** exponent
+            * (self.gross / gross[:, None]).sum(axis=0)
+        )
+
+    def vol(self, weights):
+        """Calcula a volatilidade anualizada do portfólio
+
+        Arguments:
+            weights {array} -- Pesos
+
+        Returns:
+            float -- Volatilidade
+        """
+        return np.sqrt(252 * weights.dot(self.cov.dot(weights)))
+
+    def vol_grad(self, weights):
+        """Calcula o gradiente da volatilidade anualizada do portfólio
+
+        Arguments:
+            weights {array} -- Pesos
+
+        Returns:
+            array -- Gradiente da volatilidade
+        """
+        cov_w = self.cov.dot(weights)
+        return 252 * cov_w / np.sqrt(252 * weights.dot(cov_w))
+
+    def sharpe(self, weights):
+        """Calcula o sharpe anualizado do portfólio
+
+        Arguments:
+            weights {array} -- Pesos
+
+        Returns:
+            float -- Sharpe
+        """
+        return self.ret(weights) / self.vol(weights)
+
+    def sharpe_grad(self, weights):
+        """Calcula o gradiente do sharpe anualizado do portfólio
+
+        Arguments:
+            weights {array} -- Pesos
+
+        Returns:
+            array -- Gradiente do sharpe
+        """
+        annual_vol = self.vol(weights)
+        return (
+            self.ret_grad(weights) * annual_vol
+            - self.ret(weights) * self.vol_grad(weights)
+        ) / annual_vol ** 2
 
 
 def ret(weights, rets):
@@ -65,3 +182,117 @@ def cvar(weights, rets, var_level):
 
     port_ret = (rets * weights).sum(axis=1)
     return calc.cvar(port_ret, var_level)
+
+
+def ret_grad(weights, rets):
+    """Calcula o gradiente analítico do retorno anualizado do portfólio em relação aos pesos
+
+    Arguments:
+        rets {dataframe} -- Tabela com retornos
+        weights {dataframe} -- Tabela com pesos
+
+    Returns:
+        array -- Gradiente do retorno
+    """
+
+    rets = np.asarray(rets)
+    gross = 1 + rets.dot(weights)
+    exponent = 252 / gross.size
+
+    return exponent * np.prod(gross) ** exponent * (rets / gross[:, None]).sum(axis=0)
+
+
+def vol_grad(weights, rets):
+    """Calcula o gradiente analítico da volatilidade anualizada do portfólio em relação aos pesos
+
+    Arguments:
+        rets {dataframe} -- Tabela com retornos
+        weights {dataframe} -- Tabela com pesos
+
+    Returns:
+        array -- Gradiente da volatilidade
+    """
+
+    rets = np.asarray(rets)
+    rets = rets - rets.mean(axis=0)
+    port_ret = rets.dot(weights)
+    std = np.sqrt(port_ret.dot(port_ret) / (port_ret.size - 1))
+
+    return np.sqrt(252) * rets.T.dot(port_ret) / ((port_ret.size - 1) * std)
+
+
+def sharpe_grad(weights, rets):
+    """Calcula o gradiente analítico do sharpe anualizado do portfólio em relação aos pesos
+
+    Arguments:
+        rets {dataframe} -- Tabela com retornos
+        weights {dataframe} -- Tabela com pesos
+
+    Returns:
+        array -- Gradiente do sharpe
+    """
+
+    port_ret = pd.Series(np.asarray(rets).dot(weights))
+    annual_ret = calc.ret_annual(port_ret)
+    annual_vol = calc.vol_annual(port_ret)
+
+    return (
+        ret_grad(weights, rets) * annual_vol - annual_ret * vol_grad(weights, rets)
+    ) / annual_vol ** 2
+
+
+def cvar_grad(weights, rets, var_level):
+    """Calcula um subgradiente do CVar do portfólio em relação aos pesos.
+    O CVar não é diferenciável, então é utilizada a média dos retornos dos dias que compõem a cauda.
+
+    Arguments:
+        rets {dataframe} -- Tabela com retornos
+        weights {dataframe} -- Tabela com pesos
+        var_level {float} -- Percentil do VaR
+
+    Returns:
+        array -- Subgradiente do CVar
+    """
+
+    rets = np.asarray(rets)
+    port_ret = rets.dot(weights)
+    tail = port_ret <= calc.var(port_ret, var_level)
+
+    return rets[tail].mean(axis=0)
+
+
+def cvar_levels(weights, rets, var_levels):
+    """Calcula o CVar do portfólio em vários níveis com uma única ordenação dos retornos
+
+    Arguments:
+        rets {dataframe} -- Tabela com retornos
+        weights {dataframe} -- Tabela com pesos
+        var_levels {list} -- Percentis do VaR
+
+    Returns:
+        array -- CVar de cada nível
+    """
+
+    return calc.cvar_levels(np.asarray(rets).dot(weights), var_levels)
+
+
+def cvar_levels_grad(weights, rets, var_levels):
+    """Calcula os subgradientes do CVar do portfólio em vários níveis com uma única ordenação.
+    Cada linha é a média dos retornos dos dias que compõem a cauda do nível.
+
+    Arguments:
+        rets {dataframe} -- Tabela com retornos
+        weights {dataframe} -- Tabela com pesos
+        var_levels {list} -- Percentis do VaR
+
+    Returns:
+        array -- Matriz (níveis x ações) de subgradientes
+    """
+
+    rets = np.asarray(rets)
+    port_ret = rets.dot(weights)
+    order = np.argsort(port_ret)
+    var_values = calc.var_sorted(port_ret[order], var_levels)
+    counts = np.searchsorted(port_ret[order], var_values, side="right")
+
+    return np.cumsum(rets[order], axis=0)[counts - 1] / counts[:, None]
@@ -1,8 +1,10 @@
 import random
 import time
+from multiprocessing import Pool
 
 import numpy as np
 import scipy.optimize as sco
+import scipy.sparse as sps
 import pandas as pd
 
 from fineng.utils import printProgressBar, log, gen_dates
@@ -49,6 +51,37 @@ def gen_port(
     return df.transpose()
 
 
+OBJECTIVES = {}
+SOLVERS = {}
+
+
+def register_objective(name, builder, moments=False):
+    """Registra um método de otimização, tornando-o disponível em gen_port_optimized e Strategy
+
+    Arguments:
+        name {str} -- Nome do método (opt_method)
+        builder {function} -- Função builder(rets, date_from, date_to, extra_args, moments) que monta o problema.
+            O problema é um dicionário com 'fun', 'jac', 'args' e 'constraints' no formato do
+            scipy.optimize.minimize e 'solver', o otimizador padrão do método. Formulações específicas podem
+            ser adicionadas: 'qp' (active_set), 'lp' (highs) e 'simplex' = True quando as únicas restrições
+            são o orçamento e os limites de peso (projected_gradient)
+
+    Keyword Arguments:
+        moments {bool} -- Se True, o builder recebe os momentos (Moments) da janela (default: {False})
+    """
+    OBJECTIVES[name] = (builder, moments)
+
+
+def register_solver(name, solver):
+    """Registra um otimizador, tornando-o disponível em gen_port_optimized e Strategy
+
+    Arguments:
+        name {str} -- Nome do otimizador (solver)
+        solver {function} -- Função solver(problem, x0, min_w, max_w, tol) que retorna um OptimizeResult
+    """
+    SOLVERS[name] = solver
+
+
 def gen_port_optimized(
     rets,
     opt_method,
@@ -60,17 +93,26 @@ def gen_port_optimized(
     allow_short=False,
     row_name="",
     minimization_tolerance=None,
+    moments=None,
+    annualization="arithmetic",
+    x0=None,
+    solver="auto",
+    full_output=False,
+    covariance="sample",
+    covariance_args=None,
 ):
     """Gera portfólio otimizado
 
     Arguments:
         rets {dataframe} -- Dataframe com retornos das ações
-        opt_method {str} -- String contendo nome do método a ser utilizado para otimizar.
+        opt_method {str} -- String contendo nome do método a ser utilizado para otimizar (ver OBJECTIVES).
             min_vol: Dado um retorno desejado, calcula o portfólio com o menor devio padrão possível.
+            min_vol_master: Calcula o portfólio com o menor desvio padrão possível.
             max_sharpe: Tenta maximizar o Sharpe Ratio, que é a razão entre retorno e volatilidade do portfólio. Isso significa que quanto maior o seu valor, maior é seu retorno por risco, então quanto maior melhor.
             min_cvar: Tenta diminuir o valor médio das piores perdas do portfólio. Deve ser inserido no argumento 'args' o percentual dessas piores perdas (Geralmente é utilizado 5%)
-            max_treynor: Tem como objetivo maximizar o retorno do portfólio divido pelo seu Beta. O beta é a relação entre o retorno do portfólio e o retorno do mercado. Quanto mais alto, mais arriscado é.
-            max_sortino: Busca maximizar o retorno do portfólio divido variância dos retornos negativos. Ou seja, não leva em consideração a variação total, mas sim a variância das perdas.
+            min_cvar_lp: Mesmo objetivo do min_cvar, resolvido de forma exata como programa linear (ver gen_port_cvar_lp).
+            max_return1: Busca maximizar o retorno tendo diferentes percentis superiores ao de seu benchmark.
+            sthocastic_dominance1: Busca maximizar a distância do menor percentil do índice em relação ao de seu benchmark.
         date_from {[type]} -- [description]
         date_to {[type]} -- [description]
 
@@ -78,91 +120,983 @@ def gen_port_optimized(
         extra_args -- Argumentos extra a serem utilizados no método (default: {False})
         allow_short {bool} -- [description] (default: {False})
         row_name {str} -- Nome do index do datafame retornado (default: {''})
+        moments {Moments} -- Momentos pré-calculados da janela. Se None, são calculados aqui (default: {None})
+        annualization {str} -- Anualização do retorno nos métodos de média-variância, 'arithmetic' ou 'geometric' (default: {'arithmetic'})
+        x0 {array} -- Pesos iniciais da otimização. Se None, parte do portfólio igualmente distribuído (default: {None})
+        solver {str} -- Otimizador (ver SOLVERS): 'SLSQP', 'trust-constr', 'highs', 'active_set', 'projected_gradient'
+            ou 'auto', que usa o otimizador padrão do método (default: {'auto'})
+        full_output {bool} -- Se True, também retorna o resultado do otimizador, com o otimizador utilizado e o tempo
+            gasto. No QP inclui os limites ativos (default: {False})
+        covariance {str} -- Estimador da covariância dos métodos de média-variância, ver fineng.covariance (default: {'sample'})
+        covariance_args {dict} -- Argumentos extras do estimador da covariância (default: {None})
 
     Returns:
         [type] -- [description]
     """
 
+    if opt_method not in OBJECTIVES:
+        raise ValueError("No valid opt_method inserted: {}".format(opt_method))
+    builder, uses_moments = OBJECTIVES[opt_method]
+
+    # Métodos de média-variância são avaliados sobre os momentos da janela
+    if uses_moments and moments is None:
+        moments = obj.Moments(
+            rets,
+            annualization=annualization,
+            covariance=covariance,
+            covariance_args=covariance_args,
+        )
+
+    problem = builder(rets, date_from, date_to, extra_args, moments)
+    if solver == "auto":
+        solver = problem["solver"]
+    if solver not in SOLVERS:
+        raise ValueError("No valid solver inserted: {}".format(solver))
+
     noa = len(rets.columns)
-    eweights = np.array(noa * [1.0 / noa])
+    eweights = np.array(noa * [1.0 / noa]) if x0 is None else np.asarray(x0)
 
-    bnds = tuple((min_w, max_w) for x in range(noa))
+    start = time.time()
+    opts = SOLVERS[solver](problem, eweights, min_w, max_w, minimization_tolerance)
+    opts["time"] = time.time() - start
+    opts["solver"] = solver
+
+    return _portfolio_from_result(opts, rets, date_from, date_to, row_name, full_output)
+
+
+def gen_port_cvar_lp(
+    rets, date_from, date_to, min_w, max_w, var_level, row_name="", full_output=False
+):
+    """Gera o portfólio de menor CVar pela formulação linear de Rockafellar-Uryasev, resolvida pelo HiGHS.
+    As variáveis são os pesos w, o VaR alpha e o excesso de perda u de cada dia:
+
+        min alpha + 1 / (q * T) * sum(u)
+        s.a. u >= -R w - alpha, u >= 0, sum(w) = 1, min_w <= w <= max_w
+
+    Arguments:
+        rets {dataframe} -- Dataframe com retornos das ações
+        date_from {str} -- Data inicial do período in-sample
+        date_to {str} -- Data final do período in-sample
+        min_w {float} -- Peso mínimo por ação
+        max_w {float} -- Peso máximo por ação
+        var_level {float} -- Percentual das piores perdas (Geralmente é utilizado 5)
+
+    Keyword Arguments:
+        row_name {str} -- Nome do index do datafame retornado (default: {''})
+        full_output {bool} -- Se True, também retorna o resultado do otimizador (default: {False})
 
-    cons = {"type": "eq", "fun": lambda x: np.sum(x) - 1}
-
-    if opt_method == "max_sharpe":
-        opt_method = lambda w, r: -obj.sharpe(w, r)
-        arguments = rets
-
-    elif opt_method == "min_vol":
-        opt_method = obj.vol
-        arguments = rets
-        cons = (cons, {"type": "ineq", "fun": lambda x: obj.ret(x, rets) - extra_args})
-
-    elif opt_method == "min_vol_master":
-        opt_method = obj.vol
-        arguments = rets
-
-    elif opt_method == "min_cvar":
-        opt_method = lambda w, r, v_l: 0 - obj.cvar(w, r, v_l)
-        arguments = (rets, extra_args)
-
-    elif opt_method == "max_return1":
-        market = extra_args.loc[date_from:date_to]
-        var_list = [1, 5, 25, 50, 75, 95, 99]
-        arguments = rets
-        opt_method = lambda x, r: -obj.ret(x, r)
-        cons = [{"type": "eq", "fun": lambda x: np.sum(x) - 1}]
-        for _, var1 in enumerate(var_list):
-            for _, var2 in enumerate(var_list):
-                if var2 > var1:
-                    cons.append(
-                        {
-                            "type": "ineq",
-                            "fun": lambda x: (
-                                obj.cvar(x, rets, var2) - obj.cvar(x, rets, var1)
-                            )
-                            - (calc.cvar(market, var2) - calc.cvar(market, var1)),
-                        }
-                    )
-        cons = tuple(cons)
-
-    elif opt_method == "sthocastic_dominance1":
-        market = extra_args.loc[date_from:date_to]
-        cons = {"type": "eq", "fun": lambda x: np.sum(x) - 1}
-        cons = (
-            cons,
+    Returns:
+        DataFrame -- Pesos do portfólio, ou None se a otimização falhar
+    """
+
+    return gen_port_optimized(
+        rets,
+        "min_cvar",
+        date_from=date_from,
+        date_to=date_to,
+        min_w=min_w,
+        max_w=max_w,
+        extra_args=var_level,
+        row_name=row_name,
+        solver="highs",
+        full_output=full_output,
+    )
+
+
+def telemetry(opts):
+    """Resume o resultado de uma otimização para acompanhamento de desempenho
+
+    Arguments:
+        opts {OptimizeResult} -- Resultado retornado por gen_port_optimized com full_output=True
+
+    Returns:
+        dict -- Otimizador, iterações, avaliações da função e do gradiente, tempo e status
+    """
+    return {
+        "solver": opts.get("solver"),
+        "success": bool(opts.get("success")),
+        "status": opts.get("status"),
+        "message": opts.get("message"),
+        "nit": opts.get("nit"),
+        "nfev": opts.get("nfev"),
+        "njev": opts.get("njev"),
+        "time": opts.get("time"),
+    }
+
+
+_BUDGET = {
+    "type": "eq",
+    "fun": lambda x: np.sum(x) - 1,
+    "jac": lambda x: np.ones_like(x),
+}
+
+
+def _max_sharpe(rets, date_from, date_to, extra_args, moments):
+    return {
+        "fun": lambda w, m: -m.sharpe(w),
+        "jac": lambda w, m: -m.sharpe_grad(w),
+        "args": (moments,),
+        "constraints": (_BUDGET,),
+        "simplex": True,
+        "solver": "SLSQP",
+    }
+
+
+def _min_vol(rets, date_from, date_to, extra_args, moments):
+    problem = {
+        "fun": lambda w, m: m.vol(w),
+        "jac": lambda w, m: m.vol_grad(w),
+        "args": (moments,),
+        "constraints": (
+            _BUDGET,
             {
                 "type": "ineq",
-                "fun": lambda x: obj.cvar(x, rets, 1) - calc.cvar(market, 1),
+                "fun": lambda x: moments.ret(x) - extra_args,
+                "jac": lambda x: moments.ret_grad(x),
             },
+        ),
+        "solver": "SLSQP",
+    }
+
+    # Com retorno aritmético a restrição de retorno é linear e o problema é um QP convexo
+    if moments.annualization == "arithmetic":
+        problem["qp"] = {
+            "cov": moments.cov,
+            "mean": 252 * moments.mean,
+            "target": extra_args,
+        }
+        problem["solver"] = "active_set"
+    return problem
+
+
+def _min_vol_master(rets, date_from, date_to, extra_args, moments):
+    return {
+        "fun": lambda w, m: m.vol(w),
+        "jac": lambda w, m: m.vol_grad(w),
+        "args": (moments,),
+        "constraints": (_BUDGET,),
+        "qp": {"cov": moments.cov},
+        "simplex": True,
+        "solver": "active_set",
+    }
+
+
+def _min_cvar(rets, date_from, date_to, extra_args, moments):
+    return {
+        "fun": lambda w, r, v_l: 0 - obj.cvar(w, r, v_l),
+        "jac": lambda w, r, v_l: 0 - obj.cvar_grad(w, r, v_l),
+        "args": (rets, extra_args),
+        "constraints": (_BUDGET,),
+        "lp": {"rets": rets, "var_level": extra_args},
+        "solver": "SLSQP",
+    }
+
+
+def _min_cvar_lp(rets, date_from, date_to, extra_args, moments):
+    problem = _min_cvar(rets, date_from, date_to, extra_args, moments)
+    problem["solver"] = "highs"
+    return problem
+
+
+def _max_return1(rets, date_from, date_to, extra_args, moments):
+    var_list = [1, 5, 25, 50, 75, 95, 99]
+    # O mercado é fixo na janela, então seu perfil de cauda é calculado uma única vez
+    market = calc.TailProfile(extra_args.loc[date_from:date_to], var_list)
+
+    # Todos os pares de níveis (var1 < var2) formam uma única restrição vetorial:
+    # o spread de CVar do portfólio entre os níveis deve ser maior que o do mercado
+    low, high = np.triu_indices(len(var_list), k=1)
+    market_spread = market.cvar[high] - market.cvar[low]
+
+    def spread(x):
+        cvar_values = obj.cvar_levels(x, rets, var_list)
+        return cvar_values[high] - cvar_values[low] - market_spread
+
+    def spread_jac(x):
+        cvar_grads = obj.cvar_levels_grad(x, rets, var_list)
+        return cvar_grads[high] - cvar_grads[low]
+
+    return {
+        "fun": lambda x, r: -obj.ret(x, r),
+        "jac": lambda x, r: -obj.ret_grad(x, r),
+        "args": (rets,),
+        "constraints": (_BUDGET, {"type": "ineq", "fun": spread, "jac": spread_jac}),
+        "solver": "SLSQP",
+    }
+
+
+def _sthocastic_dominance1(rets, date_from, date_to, extra_args, moments):
+    var_list = [1, 5, 10, 25, 50, 75, 90, 95, 100]
+    # O mercado é fixo na janela, então seu perfil de cauda é calculado uma única vez
+    market = calc.TailProfile(extra_args.loc[date_from:date_to], var_list)
+
+    # O objetivo é o negativo do menor spread, então o subgradiente é o gradiente do CVar do nível que o determina
+    def jac(x, r):
+        spreads = market.cvar - obj.cvar_levels(x, r, var_list)
+        return obj.cvar_levels_grad(x, r, var_list)[int(np.argmin(spreads))]
+
+    return {
+        "fun": lambda x, r: -np.min(market.cvar - obj.cvar_levels(x, r, var_list)),
+        "jac": jac,
+        "args": (rets,),
+        "constraints": (
+            _BUDGET,
+            {
+                "type": "ineq",
+                "fun": lambda x: obj.cvar(x, rets, 1) - market.cvar_at(1),
+                "jac": lambda x: obj.cvar_grad(x, rets, 1),
+            },
+        ),
+        "solver": "SLSQP",
+    }
+
+
+register_objective("max_sharpe", _max_sharpe, moments=True)
+register_objective("min_vol", _min_vol, moments=True)
+register_objective("min_vol_master", _min_vol_master, moments=True)
+register_objective("min_cvar", _min_cvar)
+register_objective("min_cvar_lp", _min_cvar_lp)
+register_objective("max_return1", _max_return1)
+register_objective("sthocastic_dominance1", _sthocastic_dominance1)
+
+
+def _solve_slsqp(problem, x0, min_w, max_w, tol):
+    return sco.minimize(
+        fun=problem["fun"],
+        x0=x0,
+        args=problem["args"],
+        jac=problem["jac"],
+        method="SLSQP",
+        bounds=tuple((min_w, max_w) for x in range(x0.size)),
+        constraints=problem["constraints"],
+        tol=tol,
+    )
+
+
+def _solve_trust_constr(problem, x0, min_w, max_w, tol):
+    return sco.minimize(
+        fun=problem["fun"],
+        x0=x0,
+        args=problem["args"],
+        jac=problem["jac"],
+        hess=sco.BFGS(),
+        method="trust-constr",
+        bounds=sco.Bounds(min_w, max_w),
+        constraints=problem["constraints"],
+        tol=tol,
+    )
+
+
+def _solve_highs(problem, x0, min_w, max_w, tol):
+    if "lp" not in problem:
+        raise ValueError("Solver highs needs a linear formulation of the method")
+
+    # Formulação de Rockafellar-Uryasev, ver gen_port_cvar_lp
+    r = np.asarray(problem["lp"]["rets"], dtype=float)
+    days, noa = r.shape
+    var_level = problem["lp"]["var_level"]
+    if not var_level or var_level <= 0:
+        raise ValueError("Invalid var_level for CVaR: {}".format(var_level))
+
+    c = np.concatenate(
+        [np.zeros(noa), [1.0], np.full(days, 1.0 / (days * var_level / 100))]
+    )
+
+    # -R w - alpha - u <= 0
+    a_ub = sps.hstack(
+        [sps.csr_matrix(-r), -np.ones((days, 1)), -sps.identity(days)], format="csr"
+    )
+    a_eq = np.concatenate([np.ones(noa), np.zeros(1 + days)])[None, :]
+    bnds = [(min_w, max_w)] * noa + [(None, None)] + [(0, None)] * days
+
+    opts = sco.linprog(
+        c,
+        A_ub=a_ub,
+        b_ub=np.zeros(days),
+        A_eq=a_eq,
+        b_eq=[1.0],
+        bounds=bnds,
+        method="highs",
+    )
+    if opts["success"]:
+        opts["x"] = opts["x"][:noa]
+    return opts
+
+
+def _solve_active_set(problem, x0, min_w, max_w, tol):
+    if "qp" not in problem:
+        raise ValueError(
+            "Solver active_set needs a quadratic formulation of the method"
         )
-        opt_method = lambda x, r: -min(
-            calc.cvar(market, 1) - obj.cvar(x, r, 1),
-            calc.cvar(market, 5) - obj.cvar(x, r, 5),
-            calc.cvar(market, 10) - obj.cvar(x, r, 10),
-            calc.cvar(market, 25) - obj.cvar(x, r, 25),
-            calc.cvar(market, 50) - obj.cvar(x, r, 50),
-            calc.cvar(market, 75) - obj.cvar(x, r, 75),
-            calc.cvar(market, 90) - obj.cvar(x, r, 90),
-            calc.cvar(market, 95) - obj.cvar(x, r, 95),
-            calc.cvar(market, 100) - obj.cvar(x, r, 100),
+
+    qp = problem["qp"]
+    opts = min_variance_active_set(
+        qp["cov"],
+        min_w,
+        max_w,
+        mean=qp.get("mean"),
+        target=qp.get("target"),
+        x0=x0,
+    )
+    opts["fun"] = problem["fun"](opts["x"], *problem["args"])
+    return opts
+
+
+def _solve_projected_gradient(problem, x0, min_w, max_w, tol):
+    if not problem.get("simplex"):
+        raise ValueError(
+            "Solver projected_gradient only supports budget and weight bound constraints"
         )
-        arguments = rets
 
+    return projected_gradient(
+        problem["fun"],
+        problem["jac"],
+        x0,
+        min_w,
+        max_w,
+        args=problem["args"],
+        tol=1e-6 if tol is None else tol,
+    )
+
+
+register_solver("SLSQP", _solve_slsqp)
+register_solver("trust-constr", _solve_trust_constr)
+register_solver("highs", _solve_highs)
+register_solver("active_set", _solve_active_set)
+register_solver("projected_gradient", _solve_projected_gradient)
+
+
+def projected_gradient(fun, jac, x0, min_w, max_w, args=(), maxiter=5000, tol=1e-6):
+    """Gradiente projetado acelerado (FISTA) com busca linear e reinício, para problemas cujas únicas restrições
+    são o orçamento e os limites de peso. A projeção em sum(w) = 1, min_w <= w <= max_w é project_capped_simplex.
+    Se os limites forem incompatíveis com o orçamento, retorna success=False sem otimizar.
+
+    Arguments:
+        fun {function} -- Função objetivo fun(w, *args)
+        jac {function} -- Gradiente jac(w, *args)
+        x0 {array} -- Ponto inicial
+        min_w {float} -- Peso mínimo por ação
+        max_w {float} -- Peso máximo por ação
+
+    Keyword Arguments:
+        args {tuple} -- Argumentos extras da função e do gradiente (default: {()})
+        maxiter {int} -- Máximo de iterações (default: {5000})
+        tol {float} -- Tolerância da variação dos pesos entre iterações (default: {1e-6})
+
+    Returns:
+        OptimizeResult -- Resultado com x, fun, success, status, message, nit, nfev e njev
+    """
+
+    noa = len(x0)
+    if noa * min_w > 1 + 1e-12 or noa * max_w < 1 - 1e-12:
+        return sco.OptimizeResult(
+            x=np.ones(noa) / noa,
+            success=False,
+            status=2,
+            message="Bounds are not compatible with the budget constraint",
+            nit=0,
+            nfev=0,
+            njev=0,
+        )
+
+    x = project_capped_simplex(x0, min_w, max_w)
+    y = x
+    f_x = fun(x, *args)
+    momentum = 1.0
+    step = 1.0
+    nfev, njev = 1, 0
+    status, message = 1, "Iteration limit reached"
+
+    for nit in range(1, maxiter + 1):
+        if y is x:
+            f_y = f_x
+        else:
+            f_y = fun(y, *args)
+            nfev += 1
+        g_y = jac(y, *args)
+        njev += 1
+
+        # Busca linear: reduz o passo até o modelo quadrático majorar a função
+        while True:
+            x_new = project_capped_simplex(y - step * g_y, min_w, max_w)
+            diff = x_new - y
+            f_new = fun(x_new, *args)
+            nfev += 1
+            if (
+                f_new <= f_y + g_y.dot(diff) + diff.dot(diff) / (2 * step)
+                or step < 1e-12
+            ):
+                break
+            step = step / 2
+
+        # Reinicia a aceleração quando a função piora
+        if f_new > f_x:
+            momentum = 1.0
+            y = x
+            continue
+
+        converged = np.abs(x_new - x).max() <= tol
+        next_momentum = (1 + np.sqrt(1 + 4 * momentum**2)) / 2
+        y = x_new + (momentum - 1) / next_momentum * (x_new - x)
+        momentum = next_momentum
+        x, f_x = x_new, f_new
+        step = step * 2
+        if converged:
+            status, message = 0, "Optimization terminated successfully"
+            break
+
+    return sco.OptimizeResult(
+        x=x,
+        fun=f_x,
+        success=status == 0,
+        status=status,
+        message=message,
+        nit=nit,
+        nfev=nfev,
+        njev=njev,
+    )
+
+
+def efficient_frontier(
+    rets,
+    targets,
+    min_w=0,
+    max_w=0.05,
+    moments=None,
+    annualization="arithmetic",
+    threads=1,
+    minimization_tolerance=None,
+    covariance="sample",
+    covariance_args=None,
+):
+    """Calcula a fronteira eficiente de uma janela: para cada retorno desejado, o portfólio de menor volatilidade.
+    Os momentos da janela são calculados uma única vez e cada ponto parte da solução do ponto anterior.
+
+    Arguments:
+        rets {dataframe} -- Dataframe com retornos das ações
+        targets {list} -- Retornos anualizados desejados
+
+    Keyword Arguments:
+        min_w {float} -- Peso mínimo por ação (default: {0})
+        max_w {float} -- Peso máximo por ação (default: {0.05})
+        moments {Moments} -- Momentos pré-calculados da janela. Se None, são calculados aqui (default: {None})
+        annualization {str} -- Anualização do retorno, 'arithmetic' ou 'geometric' (default: {'arithmetic'})
+        threads {int} -- Quantidade de processos. Os retornos desejados são divididos em faixas consecutivas (default: {1})
+        minimization_tolerance {float} -- Tolerância do otimizador (default: {None})
+        covariance {str} -- Estimador da covariância, ver fineng.covariance (default: {'sample'})
+        covariance_args {dict} -- Argumentos extras do estimador da covariância (default: {None})
+
+    Returns:
+        DataFrame -- Pesos, retorno e volatilidade de cada ponto, indexado pelo retorno desejado.
+            Pontos inviáveis ficam com NaN
+    """
+
+    if moments is None:
+        moments = obj.Moments(
+            rets,
+            annualization=annualization,
+            covariance=covariance,
+            covariance_args=covariance_args,
+        )
+
+    targets = np.sort(np.asarray(targets, dtype=float))
+
+    # Com retorno aritmético, o maior retorno viável é um programa linear: pontos acima dele nem são resolvidos
+    feasible = targets
+    if moments.annualization == "arithmetic":
+        best = sco.linprog(
+            -moments.mean,
+            A_eq=np.ones((1, moments.mean.size)),
+            b_eq=[1.0],
+            bounds=(min_w, max_w),
+            method="highs",
+        )
+        if best["success"]:
+            feasible = targets[targets <= -252 * best["fun"]]
+
+    size = max(-(-feasible.size // threads), 1)
+    tasks = [
+        (moments, feasible[i : i + size], min_w, max_w, minimization_tolerance)
+        for i in range(0, feasible.size, size)
+    ]
+
+    if threads > 1:
+        p = Pool(threads)
+        weights = p.map(_frontier_sweep, tasks)
+        p.close()
+        p.join()
     else:
-        Warning("No valid opt_method inserted")
+        weights = [_frontier_sweep(task) for task in tasks]
 
-    opts = sco.minimize(
-        fun=opt_method,
-        x0=eweights,
-        args=arguments,
-        method="SLSQP",
-        bounds=bnds,
-        constraints=cons,
-        tol=minimization_tolerance,
+    weights = np.vstack(
+        weights + [np.full((targets.size - feasible.size, moments.mean.size), np.nan)]
+    )
+    frontier = pd.DataFrame(weights, index=targets, columns=rets.columns)
+    frontier.index.name = "Target"
+    frontier["Return"] = [moments.ret(w) for w in weights]
+    frontier["Volatility"] = [moments.vol(w) for w in weights]
+    return frontier
+
+
+def _frontier_sweep(task):
+    """Resolve em sequência uma faixa de pontos da fronteira, usando cada solução como ponto inicial do próximo
+
+    Arguments:
+        task {tuple} -- Momentos, retornos desejados, peso mínimo, peso máximo e tolerância
+
+    Returns:
+        array -- Matriz (pontos x ações) de pesos
+    """
+
+    moments, targets, min_w, max_w, minimization_tolerance = task
+    noa = moments.mean.size
+    x0 = np.array(noa * [1.0 / noa])
+    bnds = tuple((min_w, max_w) for x in range(noa))
+    cons = (
+        {
+            "type": "eq",
+            "fun": lambda x: np.sum(x) - 1,
+            "jac": lambda x: np.ones_like(x),
+        },
+        {
+            "type": "ineq",
+            "fun": lambda x, target: moments.ret(x) - target,
+            "jac": lambda x, target: moments.ret_grad(x),
+        },
+    )
+
+    weights = np.full((targets.size, noa), np.nan)
+    for i, target in enumerate(targets):
+        cons[1]["args"] = (target,)
+        opts = sco.minimize(
+            fun=moments.vol,
+            x0=x0,
+            jac=moments.vol_grad,
+            method="SLSQP",
+            bounds=bnds,
+            constraints=cons,
+            tol=minimization_tolerance,
+        )
+        if opts["success"]:
+            weights[i] = opts["x"]
+            x0 = opts["x"]
+    return weights
+
+
+def gen_port_batched(
+    windows,
+    row_names,
+    opt_method,
+    min_w,
+    max_w,
+    maxiter=1000,
+    tol=1e-6,
+    full_output=False,
+):
+    """Otimiza todas as janelas ao mesmo tempo por gradiente projetado acelerado (FISTA) vetorizado.
+    As janelas são empilhadas em um array (janelas x dias x ações), completado com zeros e mascarado
+    para os dias e ações que não existem em cada janela. Cada iteração é um punhado de operações NumPy
+    sobre todas as janelas, e a projeção no simplex com limites é feita em todas de uma vez.
+    Suporta os métodos cujas únicas restrições são orçamento e limites de peso, com retorno aritmético.
+    Janelas que não convergem em maxiter iterações ficam de fora dos pesos, como no otimizador por janela.
+
+    Arguments:
+        windows {list} -- Dataframes de retornos de cada janela (já filtrados, sem NaN)
+        row_names {list} -- Nome de cada janela no dataframe de pesos
+        opt_method {str} -- 'max_sharpe' ou 'min_vol_master'
+        min_w {float} -- Peso mínimo por ação
+        max_w {float} -- Peso máximo por ação
+
+    Keyword Arguments:
+        maxiter {int} -- Máximo de iterações (default: {1000})
+        tol {float} -- Tolerância da variação dos pesos entre iterações (default: {1e-6})
+        full_output {bool} -- Se True, também retorna a telemetria de cada janela (default: {False})
+
+    Returns:
+        DataFrame -- Pesos de cada janela, no mesmo formato dos pesos de Strategy
+    """
+
+    if opt_method not in ("max_sharpe", "min_vol_master"):
+        raise ValueError("Batched solver does not support {}".format(opt_method))
+
+    start = time.time()
+
+    # Janelas sem ações suficientes para o orçamento não têm solução, como no SLSQP
+    feasible = [
+        w.shape[0] > 1 and w.shape[1] * max_w >= 1 and w.shape[1] * min_w <= 1
+        for w in windows
+    ]
+    failed = [name for name, f in zip(row_names, feasible) if not f]
+    windows = [w for w, f in zip(windows, feasible) if f]
+    row_names = [name for name, f in zip(row_names, feasible) if f]
+    for name in failed:
+        log("Error ocurred in calculation of period {}".format(name))
+
+    if not windows:
+        raise ValueError("No window has a feasible portfolio")
+
+    columns = sorted(set().union(*[w.columns for w in windows]))
+    position = {c: i for i, c in enumerate(columns)}
+    n_windows, noa = len(windows), len(columns)
+    days = np.array([w.shape[0] for w in windows])
+
+    # Retornos centrados, com zeros nos dias e ações que não existem na janela
+    assets = np.zeros((n_windows, noa), dtype=bool)
+    centered = np.zeros((n_windows, days.max(), noa))
+    mean = np.zeros((n_windows, noa))
+    for i, w in enumerate(windows):
+        idx = [position[c] for c in w.columns]
+        values = np.asarray(w, dtype=float)
+        assets[i, idx] = True
+        mean[i, idx] = values.mean(axis=0)
+        centered[i, : days[i]][:, idx] = values - values.mean(axis=0)
+    scale = (252 / np.maximum(days - 1, 1))[:, None]
+
+    lower = np.where(assets, min_w, 0.0)
+    upper = np.where(assets, max_w, 0.0)
+
+    def fun_grad(w):
+        # Volatilidade anualizada e seu gradiente, sem montar as matrizes de covariância
+        port = np.einsum("wtn,wn->wt", centered, w)
+        variance = scale[:, 0] * (port**2).sum(axis=1)
+        variance_grad = 2 * scale * np.einsum("wtn,wt->wn", centered, port)
+        if opt_method == "min_vol_master":
+            return variance, variance_grad
+        ret = 252 * (mean * w).sum(axis=1)
+        vol = np.sqrt(variance)
+        fun = -ret / vol
+        grad = -(
+            252 * mean * vol[:, None]
+            - ret[:, None] * variance_grad / (2 * vol[:, None])
+        )
+        return fun, grad / variance[:, None]
+
+    x = project_capped_simplex(assets / assets.sum(axis=1, keepdims=True), lower, upper)
+    y = x.copy()
+    f_x, _ = fun_grad(x)
+    momentum = np.ones(n_windows)
+    step = np.ones(n_windows)
+    done = np.zeros(n_windows, dtype=bool)
+    nit = np.zeros(n_windows, dtype=int)
+
+    for _ in range(maxiter):
+        f_y, g_y = fun_grad(y)
+
+        # Busca linear por janela: reduz o passo até o modelo quadrático majorar a função
+        pending = ~done
+        x_new, f_new = y.copy(), f_y.copy()
+        for _ in range(60):
+            candidate = project_capped_simplex(y - step[:, None] * g_y, lower, upper)
+            f_candidate, _ = fun_grad(candidate)
+            diff = candidate - y
+            ok = f_candidate <= f_y + (g_y * diff).sum(axis=1) + (diff**2).sum(
+                axis=1
+            ) / (2 * step)
+            accept = pending & (ok | (step < 1e-12))
+            x_new[accept] = candidate[accept]
+            f_new[accept] = f_candidate[accept]
+            pending = pending & ~accept
+            if not pending.any():
+                break
+            step = np.where(pending, step / 2, step)
+
+        active = ~done
+        nit[active] += 1
+
+        # Reinicia a aceleração das janelas em que a função piorou
+        restart = active & (f_new > f_x)
+        moving = active & ~restart
+        converged = active & (np.abs(x_new - x).max(axis=1) <= tol)
+
+        next_momentum = (1 + np.sqrt(1 + 4 * momentum**2)) / 2
+        y_new = x_new + ((momentum - 1) / next_momentum)[:, None] * (x_new - x)
+        y = np.where(moving[:, None], y_new, x)
+        momentum = np.where(moving, next_momentum, 1.0)
+        x = np.where(moving[:, None], x_new, x)
+        f_x = np.where(moving, f_new, f_x)
+        step = np.where(moving, step * 2, step)
+        done = done | converged
+        if done.all():
+            break
+
+    for i in np.flatnonzero(~done):
+        log("Error ocurred in calculation of period {}".format(row_names[i]))
+    weights = pd.DataFrame(
+        np.where(assets, x, np.nan)[done],
+        index=[name for name, d in zip(row_names, done) if d],
+        columns=columns,
+    )
+    if not full_output:
+        return weights
+
+    elapsed = (time.time() - start) / max(n_windows, 1)
+    telemetry = [
+        {
+            "period": name,
+            "solver": "batched_projected_gradient",
+            "success": bool(done[i]),
+            "status": 0 if done[i] else 1,
+            "message": (
+                "Optimization terminated successfully"
+                if done[i]
+                else "Iteration limit reached"
+            ),
+            "nit": int(nit[i]),
+            "time": elapsed,
+        }
+        for i, name in enumerate(row_names)
+    ]
+    telemetry += [
+        {
+            "period": name,
+            "solver": "batched_projected_gradient",
+            "success": False,
+            "status": 2,
+            "message": "Bounds are not compatible with the budget constraint",
+        }
+        for name in failed
+    ]
+    return weights, telemetry
+
+
+def warm_start_weights(previous, columns, min_w, max_w):
+    """Reprojeta os pesos de uma janela anterior no universo de ações da nova janela,
+    para serem utilizados como ponto inicial da otimização
+
+    Arguments:
+        previous {DataFrame} -- Linha de pesos retornada pela janela anterior
+        columns {Index} -- Ações da nova janela
+        min_w {float} -- Peso mínimo por ação
+        max_w {float} -- Peso máximo por ação
+
+    Returns:
+        array -- Pesos iniciais viáveis para a nova janela
+    """
+
+    # Ações que entraram no universo começam com peso zero
+    weights = previous.iloc[0].reindex(columns).fillna(0).values
+    return project_capped_simplex(weights, min_w, max_w)
+
+
+def project_capped_simplex(weights, min_w, max_w):
+    """Projeta (distância euclidiana) um vetor de pesos no conjunto sum(w) = 1, min_w <= w <= max_w.
+    A projeção é clip(weights - tau, min_w, max_w), com tau encontrado por bisseção.
+    Também aceita uma matriz (janelas x ações), projetando cada linha, com limites por linha e ação.
+
+    Arguments:
+        weights {array} -- Pesos
+        min_w {float} -- Peso mínimo por ação
+        max_w {float} -- Peso máximo por ação
+
+    Returns:
+        array -- Pesos projetados
+    """
+
+    weights = np.asarray(weights, dtype=float)
+    low = np.min(weights - max_w, axis=-1, keepdims=True)
+    high = np.max(weights - min_w, axis=-1, keepdims=True)
+    for _ in range(100):
+        tau = (low + high) / 2
+        over = np.clip(weights - tau, min_w, max_w).sum(axis=-1, keepdims=True) > 1
+        low = np.where(over, tau, low)
+        high = np.where(over, high, tau)
+        if np.all(high - low <= 1e-15):
+            break
+    return np.clip(weights - (low + high) / 2, min_w, max_w)
+
+
+def min_variance_active_set(
+    cov, min_w, max_w, mean=None, target=None, x0=None, maxiter=None, tol=1e-10
+):
+    """Resolve de forma exata o QP de mínima variância pelo método primal de conjunto ativo:
+
+        min w' cov w
+        s.a. sum(w) = 1, min_w <= w <= max_w e, se target for dado, mean' w >= target
+
+    O conjunto de trabalho guarda os limites (e a restrição de retorno) tratados como igualdade.
+    A cada iteração é resolvido o sistema KKT apenas nas ações livres: se o passo é nulo, o limite com
+    multiplicador negativo é liberado; se não, o passo é cortado no primeiro limite que bloqueia.
+    Como com max_w pequeno a maioria dos limites fica ativa, a solução costuma sair em poucos pivôs.
+
+    Arguments:
+        cov {array} -- Matriz de covariância
+        min_w {float} -- Peso mínimo por ação
+        max_w {float} -- Peso máximo por ação
+
+    Keyword Arguments:
+        mean {array} -- Retorno de cada ação, na mesma escala de target (default: {None})
+        target {float} -- Retorno mínimo do portfólio (default: {None})
+        x0 {array} -- Ponto inicial. Se None, parte da projeção da solução sem limites (default: {None})
+        maxiter {int} -- Máximo de iterações (default: {None}, 10 vezes o número de ações)
+        tol {float} -- Tolerância do passo e dos multiplicadores (default: {1e-10})
+
+    Returns:
+        OptimizeResult -- Resultado com x, success, status, message, nit, active_lower e active_upper
+            (índices das ações no peso mínimo e máximo)
+    """
+
+    cov = np.asarray(cov, dtype=float)
+    noa = cov.shape[0]
+    maxiter = 10 * noa if maxiter is None else maxiter
+    lower = np.full(noa, float(min_w))
+    upper = np.full(noa, float(max_w))
+    tol_mult = tol * np.abs(cov).max()
+    no_active = np.array([], dtype=int)
+
+    if noa * min_w > 1 + tol or noa * max_w < 1 - tol:
+        return sco.OptimizeResult(
+            x=np.ones(noa) / noa,
+            success=False,
+            status=2,
+            message="Bounds are not compatible with the budget constraint",
+            nit=0,
+            active_lower=no_active,
+            active_upper=no_active,
+        )
+
+    # Ponto inicial viável: a carteira de mínima variância sem limites projetada no simplex com limites
+    if x0 is None:
+        x0 = np.linalg.lstsq(cov, np.ones(noa), rcond=None)[0]
+        x0 = x0 / x0.sum() if abs(x0.sum()) > tol else np.ones(noa) / noa
+    w = project_capped_simplex(x0, min_w, max_w)
+
+    if target is not None:
+        mean = np.asarray(mean, dtype=float)
+        # Se o ponto inicial não atinge o retorno, caminha em direção à carteira de maior retorno
+        if mean.dot(w) < target:
+            best = sco.linprog(
+                -mean,
+                A_eq=np.ones((1, noa)),
+                b_eq=[1.0],
+                bounds=(min_w, max_w),
+                method="highs",
+            )
+            if not best["success"] or -best["fun"] < target - tol:
+                return sco.OptimizeResult(
+                    x=w,
+                    success=False,
+                    status=2,
+                    message="Target return is not attainable",
+                    nit=0,
+                    active_lower=no_active,
+                    active_upper=no_active,
+                )
+            theta = (target - mean.dot(w)) / (-best["fun"] - mean.dot(w))
+            w = w + min(theta, 1) * (best["x"] - w)
+
+    at_lower = np.abs(w - lower) <= tol
+    at_upper = ~at_lower & (np.abs(w - upper) <= tol)
+    ret_active = target is not None and mean.dot(w) - target <= tol
+
+    status, message = 1, "Iteration limit reached"
+    for nit in range(1, maxiter + 1):
+        free = ~(at_lower | at_upper)
+        rows = [np.ones(noa)]
+        rhs = [1.0]
+        if ret_active:
+            rows.append(mean)
+            rhs.append(target)
+        a = np.array(rows)
+
+        # Sistema KKT nas ações livres, com as demais fixas no seu limite
+        n_free = free.sum()
+        kkt = np.zeros((n_free + len(rows), n_free + len(rows)))
+        kkt[:n_free, :n_free] = cov[np.ix_(free, free)]
+        kkt[:n_free, n_free:] = -a[:, free].T
+        kkt[n_free:, :n_free] = a[:, free]
+        kkt_rhs = np.concatenate(
+            [-cov[np.ix_(free, ~free)].dot(w[~free]), rhs - a[:, ~free].dot(w[~free])]
+        )
+        try:
+            solution = np.linalg.solve(kkt, kkt_rhs)
+            if not np.allclose(kkt.dot(solution), kkt_rhs):
+                raise np.linalg.LinAlgError
+        except np.linalg.LinAlgError:
+            # Covariância singular (menos dias que ações): qualquer solução do sistema é um mínimo
+            solution = np.linalg.lstsq(kkt, kkt_rhs, rcond=None)[0]
+
+        step = np.zeros(noa)
+        step[free] = solution[:n_free] - w[free]
+        multipliers = solution[n_free:]
+
+        if np.abs(step).max() <= tol:
+            # Multiplicadores dos limites ativos; todos não negativos indicam o ótimo
+            reduced = cov.dot(w) - a.T.dot(multipliers)
+            candidates = np.concatenate(
+                [
+                    np.where(at_lower, reduced, np.inf),
+                    np.where(at_upper, -reduced, np.inf),
+                    [multipliers[1] if ret_active else np.inf],
+                ]
+            )
+            release = int(np.argmin(candidates))
+            if candidates[release] >= -tol_mult:
+                status, message = 0, "Optimization terminated successfully"
+                break
+            if release < noa:
+                at_lower[release] = False
+            elif release < 2 * noa:
+                at_upper[release - noa] = False
+            else:
+                ret_active = False
+        else:
+            # Maior passo que mantém as ações livres (e o retorno) dentro dos limites
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratio = np.where(
+                    free & (step < 0),
+                    (lower - w) / step,
+                    np.where(free & (step > 0), (upper - w) / step, np.inf),
+                )
+            blocking = int(np.argmin(ratio))
+            alpha = min(ratio[blocking], 1.0)
+            ret_alpha = np.inf
+            if target is not None and not ret_active and mean.dot(step) < 0:
+                ret_alpha = (target - mean.dot(w)) / mean.dot(step)
+
+            if ret_alpha < alpha:
+                w = w + ret_alpha * step
+                ret_active = True
+            else:
+                w = w + alpha * step
+                if alpha < 1.0:
+                    if step[blocking] < 0:
+                        w[blocking] = lower[blocking]
+                        at_lower[blocking] = True
+                    else:
+                        w[blocking] = upper[blocking]
+                        at_upper[blocking] = True
+
+    return sco.OptimizeResult(
+        x=w,
+        success=status == 0,
+        status=status,
+        message=message,
+        nit=nit,
+        active_lower=np.flatnonzero(at_lower),
+        active_upper=np.flatnonzero(at_upper),
     )
 
+
+def _portfolio_from_result(opts, rets, date_from, date_to, row_name, full_output=False):
+    """Transforma o resultado do otimizador em uma linha de pesos, registrando falhas no log
+
+    Arguments:
+        opts {OptimizeResult} -- Resultado do scipy.optimize
+        rets {dataframe} -- Dataframe com retornos das ações
+        date_from {str} -- Data inicial do período in-sample
+        date_to {str} -- Data final do período in-sample
+        row_name {str} -- Nome do index do datafame retornado
+
+    Keyword Arguments:
+        full_output {bool} -- Se True, retorna também o resultado do otimizador (default: {False})
+
+    Returns:
+        DataFrame -- Pesos do portfólio, ou None se a otimização falhar
+    """
+
+    if full_output:
+        return _portfolio_from_result(opts, rets, date_from, date_to, row_name), opts
+
     if opts["success"] == True:
         weights = opts["x"]
         df = pd.DataFrame(weights, columns=[row_name], index=rets.columns)
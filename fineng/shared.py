@@ -0,0 +1,161 @@
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import fineng.store as store
+
+# Painel de retornos do processo atual, definido pelo inicializador dos processos (ver attach)
+_panel = None
+
+# Resultados derivados do painel neste processo, do mais antigo ao mais recente, com o tamanho em bytes (ver cached)
+_cache = OrderedDict()
+CACHE_BYTES = 64 * 2**20
+
+# Painéis calculados sobre todos os retornos do painel neste processo, mantidos enquanto o painel estiver aberto (ver cached_panel)
+_panels = {}
+
+
+class SharedPanel:
+    def __init__(self, rets, directory=None):
+        """Publica a matriz de retornos uma única vez em um arquivo .npy mapeado em memória.
+        Os processos abrem o mesmo arquivo e compartilham o cache de páginas do sistema, então
+        nenhuma tarefa precisa serializar o painel inteiro. Se os retornos já são um recorte de linhas
+        de um painel mapeado em memória (ver store.load_store), o próprio arquivo do painel é usado.
+
+        Arguments:
+            rets {DataFrame} -- Retornos (dias x ações)
+
+        Keyword Arguments:
+            directory {str} -- Pasta onde o arquivo temporário é criado (default: {None}, pasta temporária do sistema)
+        """
+        self.index = rets.index
+        self.columns = rets.columns
+        values = np.asarray(rets, dtype=float)
+        self.shape = values.shape
+
+        self.directory = None
+        region = _file_region(values)
+        if region is not None:
+            self.path, self.offset = region
+        else:
+            self.directory = tempfile.mkdtemp(prefix="fineng_", dir=directory)
+            self.path = os.path.join(self.directory, "rets.npy")
+            self.offset = store.write_npy(self.path, values)
+
+    def frame(self):
+        """Abre o painel como DataFrame somente leitura, sem copiar os dados do arquivo
+
+        Returns:
+            DataFrame -- Retornos
+        """
+        values = np.memmap(
+            self.path, dtype=float, mode="r", offset=self.offset, shape=self.shape
+        )
+        return pd.DataFrame(values, index=self.index, columns=self.columns, copy=False)
+
+    def close(self):
+        """Remove o arquivo temporário do painel (o arquivo de um painel de store.load_store é mantido)"""
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def attach(panel):
+    """Inicializador dos processos: abre o painel uma vez por processo
+
+    Arguments:
+        panel {SharedPanel ou DataFrame} -- Painel publicado pelo processo principal, ou os próprios retornos
+            quando o processo já os tem em memória (ex: workers de distributed)
+    """
+    global _panel
+    _panel = panel.frame() if isinstance(panel, SharedPanel) else panel
+    _cache.clear()
+    _panels.clear()
+
+
+def detach():
+    """Fecha o painel deste processo e descarta os resultados derivados dele"""
+    global _panel
+    _panel = None
+    _cache.clear()
+    _panels.clear()
+
+
+def current():
+    """Retorna o painel aberto neste processo (None se attach não foi chamado)"""
+    return _panel
+
+
+def cached(key, function):
+    """Memoriza resultados derivados do painel aberto neste processo (ex: retornos in-sample de uma janela),
+    para que estratégias que compartilham a mesma janela não repitam o pré-processamento. Sem painel aberto,
+    apenas chama a função, já que a chave não identifica os dados.
+
+    Arguments:
+        key {tuple} -- Identificação do resultado dentro do painel
+        function {function} -- Função sem argumentos que calcula o resultado
+
+    Returns:
+        object -- Resultado de function
+    """
+    if _panel is None:
+        return function()
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key][0]
+
+    # Remove os resultados usados há mais tempo até o total caber em CACHE_BYTES
+    value = function()
+    _cache[key] = (value, sys.getsizeof(value))
+    while len(_cache) > 1 and sum(size for _, size in _cache.values()) > CACHE_BYTES:
+        _cache.popitem(last=False)
+    return value
+
+
+def cached_panel(key, function):
+    """Memoriza painéis calculados sobre todos os retornos do painel aberto neste processo (ex: o EWMA de
+    indicators), para que sejam calculados uma vez por processo e não uma vez por tarefa recebida. Ao contrário
+    de cached, os painéis não são removidos por tamanho, já que são usados por todas as janelas. Sem painel
+    aberto, apenas chama a função
+
+    Arguments:
+        key {tuple} -- Identificação do painel calculado dentro do painel de retornos
+        function {function} -- Função sem argumentos que calcula o painel
+
+    Returns:
+        object -- Resultado de function
+    """
+    if _panel is None:
+        return function()
+    if key not in _panels:
+        _panels[key] = function()
+    return _panels[key]
+
+
+def _file_region(values):
+    """Localiza uma matriz no arquivo mapeado em memória de onde ela veio
+
+    Arguments:
+        values {array} -- Matriz
+
+    Returns:
+        tuple -- Caminho do arquivo e posição do primeiro valor, em bytes (None se a matriz não for um
+            trecho contínuo de float64 de um arquivo mapeado)
+    """
+    if values.dtype != np.dtype("<f8") or not values.flags.c_contiguous:
+        return None
+    base = values
+    while isinstance(base, np.ndarray):
+        if isinstance(base, np.memmap) and isinstance(base.base, mmap.mmap):
+            if base.filename is None:
+                return None
+            start = base.__array_interface__["data"][0]
+            position = values.__array_interface__["data"][0]
+            return base.filename, base.offset + position - start
+        base = base.base
+    return None
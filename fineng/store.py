@@ -0,0 +1,116 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+MANIFEST = "manifest.json"
+
+
+def write_store(path, frame, dtype="float64"):
+    """Grava um painel (preços ou retornos) em uma pasta binária: a matriz em values.npy, as datas
+    em dates.txt, os códigos das ações em tickers.txt e a descrição em manifest.json. O manifesto
+    é gravado por último, então uma pasta sem manifesto é uma gravação incompleta
+
+    Arguments:
+        path {str} -- Pasta do painel
+        frame {DataFrame} -- Painel (datas x ações)
+
+    Keyword Arguments:
+        dtype {str} -- Tipo dos valores gravados, 'float64' ou 'float32' (default: {'float64'})
+    """
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, MANIFEST)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    index = frame.index
+    if isinstance(index, pd.DatetimeIndex):
+        index = index.strftime("%Y-%m-%d")
+    write_npy(os.path.join(path, "values.npy"), np.asarray(frame), dtype)
+    _write_lines(os.path.join(path, "dates.txt"), index)
+    _write_lines(os.path.join(path, "tickers.txt"), frame.columns)
+
+    manifest = {
+        "format": 1,
+        "dtype": np.dtype(dtype).name,
+        "shape": list(frame.shape),
+        "values": "values.npy",
+        "dates": "dates.txt",
+        "tickers": "tickers.txt",
+    }
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def load_store(path, date_from=None, date_to=None):
+    """Abre um painel gravado com write_store como DataFrame somente leitura, sem copiar os dados:
+    os valores são lidos do arquivo mapeado em memória à medida que são acessados, e processos que
+    abrem o mesmo painel compartilham o cache de páginas do sistema. Com date_from e date_to, apenas
+    as linhas do período fazem parte do DataFrame
+
+    Arguments:
+        path {str} -- Pasta do painel
+
+    Keyword Arguments:
+        date_from {str} -- Primeira data (default: {None}, início do painel)
+        date_to {str} -- Última data, inclusive (default: {None}, fim do painel)
+
+    Returns:
+        DataFrame -- Painel (datas x ações)
+    """
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    values = np.load(os.path.join(path, manifest["values"]), mmap_mode="r")
+    dates = np.array(_read_lines(os.path.join(path, manifest["dates"])))
+    tickers = _read_lines(os.path.join(path, manifest["tickers"]))
+    if list(values.shape) != manifest["shape"]:
+        raise ValueError("Store {} does not match its manifest".format(path))
+
+    first = 0 if date_from is None else np.searchsorted(dates, date_from, "left")
+    last = len(dates) if date_to is None else np.searchsorted(dates, date_to, "right")
+    return pd.DataFrame(
+        values[first:last],
+        index=pd.Index(list(dates[first:last]), dtype=object),
+        columns=pd.Index(tickers, dtype=object),
+        copy=False,
+    )
+
+
+def write_npy(file_path, values, dtype="float64"):
+    """Grava uma matriz em um arquivo .npy em blocos de linhas, sem criar uma cópia inteira em memória
+
+    Arguments:
+        file_path {str} -- Caminho do arquivo
+        values {array} -- Matriz
+
+    Keyword Arguments:
+        dtype {str} -- Tipo dos valores gravados (default: {'float64'})
+
+    Returns:
+        int -- Posição do primeiro valor no arquivo, em bytes
+    """
+    dtype = np.dtype(dtype)
+    header = {"descr": dtype.str, "fortran_order": False, "shape": values.shape}
+    with open(file_path, "wb") as f:
+        np.lib.format.write_array_header_1_0(f, header)
+        offset = f.tell()
+        rows = max(1, 2**22 // max(values.shape[1] * dtype.itemsize, 1))
+        for start in range(0, values.shape[0], rows):
+            block = np.ascontiguousarray(values[start : start + rows], dtype=dtype)
+            f.write(block.data)
+    return offset
+
+
+def _write_lines(file_path, values):
+    """Grava um valor por linha"""
+    with open(file_path, "w") as f:
+        f.write("\n".join(str(value) for value in values))
+
+
+def _read_lines(file_path):
+    """Lê um valor por linha"""
+    with open(file_path) as f:
+        text = f.read()
+    return text.split("\n") if text else []
@@ -1,15 +1,21 @@
 import datetime
 import os
+import pickle
+import time
 from random import random
-from copy import deepcopy
-from multiprocessing import Pool
 
 import numpy as np
 import pandas as pd
 
-from fineng.utils import printProgressBar, gen_dates, log
+from fineng.utils import printProgressBar, gen_dates, log, read_only
 import fineng.calculation as calc
 import fineng.port_optimization as p_opt
+import fineng.objective_function as obj
+import fineng.shared as shared
+import fineng.indicators as ind
+from fineng.cache import ResultCache
+from fineng.executor import EXECUTORS, Executor
+from fineng.weights import WeightMatrix
 
 
 class Strategy:
@@ -31,6 +37,18 @@ class Strategy:
         rsi=False,
         ewma=1,
         minimization_tolerance=None,
+        annualization="arithmetic",
+        warm_start=False,
+        solver="auto",
+        covariance="sample",
+        covariance_args=None,
+        batched=False,
+        run=True,
+        cache=None,
+        run_dir=None,
+        indicators=None,
+        copy=False,
+        executor="processes",
     ):
         """Classe principal para simular rendimento em um período de tempo
 
@@ -49,6 +67,33 @@ class Strategy:
             os_equal_is {bool} -- Se True, o período analisado será o mesmo período simulado (default: {False})
             rsi {bool} -- Valor do RSI (default: {False})
             ewma {int} -- Valor do EWMA (default: {1})
+            annualization {str} -- Anualização do retorno nos métodos de média-variância.
+                'geometric' mantém o retorno composto original (default: {'arithmetic'})
+            warm_start {bool} -- Se True, cada otimização parte da solução da janela anterior. As janelas são
+                divididas em blocos consecutivos, um por thread (default: {False})
+            solver {str} -- Otimizador: 'SLSQP', 'trust-constr', 'highs', 'active_set', 'projected_gradient' ou 'auto',
+                que usa o padrão do método. No modo 'auto', min_vol e min_vol_master são resolvidos de forma exata
+                pelo QP de conjunto ativo (default: {'auto'})
+            covariance {str} -- Estimador da covariância nos métodos de média-variância: 'sample', 'ledoit_wolf',
+                'ewma' ou 'pca' (default: {'sample'})
+            covariance_args {dict} -- Argumentos extras do estimador, ex: {'n_factors': 10} (default: {None})
+            batched {bool} -- Se True, otimiza todas as janelas ao mesmo tempo com o gradiente projetado
+                vetorizado (apenas max_sharpe e min_vol_master). Parâmetros que o otimizador vetorizado não usa (args,
+                annualization, covariance, covariance_args, solver, cache, run_dir, warm_start, threads e executor)
+                geram ValueError (default: {False})
+            run {bool} -- Se False, apenas prepara datas e retornos, sem calcular os pesos. Os pesos são
+                calculados externamente (ex: sweep.sweep) e entregues em assemble (default: {True})
+            cache {str} -- Pasta (ou ResultCache) do cache em disco dos resultados de cada janela. Janelas com os
+                mesmos retornos e parâmetros são lidas do cache em vez de otimizadas (default: {None})
+            run_dir {str} -- Pasta de checkpoint. Cada janela é salva assim que termina, janelas que geram exceção são
+                registradas na telemetria (coluna error) em vez de interromper a execução, e Strategy.resume(run_dir)
+                continua uma execução interrompida (default: {None})
+            indicators {list} -- Indicadores registrados em indicators.register_indicator, aplicados às janelas depois
+                de EWMA e RSI. Cada item é o nome do indicador ou uma tupla (nome, parâmetros) (default: {None})
+            copy {bool} -- Se True, a estratégia guarda uma cópia dos retornos. Por padrão guarda apenas o recorte
+                das datas, sem copiar, e nunca altera os retornos recebidos (default: {False})
+            executor {str} -- Execução das janelas: 'processes', 'threads' ou 'serial'. Cada worker usa no máximo
+                cpu_count // threads threads de BLAS/OpenMP (default: {'processes'})
         """
 
         self.log_path = log_path
@@ -63,6 +108,64 @@ class Strategy:
         self.__min_w = min_w
         self.__max_w = max_w
         self.__minimization_tolerance = minimization_tolerance
+        self.__annualization = annualization
+        self.__solver = solver
+        self.__covariance = covariance
+        self.__covariance_args = covariance_args
+        self.__shared = False
+        self.__date_from = date_from
+        self.__date_to = date_to
+        self.__time_is = time_is
+        self.__time_os = time_os
+        self.__os_equal_is = os_equal_is
+        self.__warm_start = warm_start
+        self.__threads = threads
+        if executor not in EXECUTORS:
+            raise ValueError("Invalid executor: {}".format(executor))
+        self.__executor = executor
+        self.__run_dir = run_dir
+
+        # O gradiente projetado vetorizado usa apenas a covariância amostral e o retorno aritmético, e otimiza
+        # todas as janelas de uma vez no próprio processo
+        if batched:
+            unsupported = [
+                param
+                for param, value, default in (
+                    ("args", args, False),
+                    ("annualization", annualization, "arithmetic"),
+                    ("covariance", covariance, "sample"),
+                    ("covariance_args", covariance_args, None),
+                    ("cache", cache, None),
+                    ("run_dir", run_dir, None),
+                    ("warm_start", warm_start, False),
+                    ("threads", threads, 1),
+                    ("executor", executor, "processes"),
+                )
+                if value != default
+            ]
+            if solver not in ("auto", "projected_gradient"):
+                unsupported.append("solver")
+            if unsupported:
+                raise ValueError(
+                    "Batched strategies do not support {}".format(
+                        ", ".join(unsupported)
+                    )
+                )
+
+        # Pré-processamento das janelas: EWMA, RSI e indicadores do usuário, nesta ordem
+        self.__indicators = []
+        if ewma > 1:
+            self.__indicators.append(("ewma", {"span": ewma}))
+        if rsi == True:
+            self.__indicators.append(("rsi", {}))
+        for indicator in indicators or []:
+            if isinstance(indicator, str):
+                indicator = (indicator, {})
+            if indicator[0] not in ind.INDICATORS:
+                raise ValueError("Invalid indicator: {}".format(indicator[0]))
+            self.__indicators.append(tuple(indicator))
+        self.__panels = {}
+        self.__cache = ResultCache(cache) if isinstance(cache, str) else cache
 
         self.details = {
             "RSI": self.__rsi,
@@ -71,6 +174,9 @@ class Strategy:
             "Min. Weight": self.__min_w,
             "Max. Weight": self.__max_w,
             "Min tol": self.__minimization_tolerance,
+            "Annualization": self.__annualization,
+            "Solver": self.__solver,
+            "Covariance": self.__covariance,
         }
         log("finish", "Defining Variables.", 1, log_path)
 
@@ -83,44 +189,445 @@ class Strategy:
                 time_is=time_is, time_os=time_os, date_from=date_from, date_to=date_to
             )
 
-        # Calcula retornos e filtra variáveis pelas datas
-        self.rets = deepcopy(rets)
-        self.rets = self.rets.loc[date_from:date_to]
-        self.rets = self.rets.iloc[1:, :]
+        # Calcula retornos e filtra variáveis pelas datas. O primeiro dia do período é descartado
+        self.__first_day = rets.loc[date_from:date_to].index[1]
+        self.rets = self.filter_returns(rets)
+        if copy:
+            self.rets = self.rets.copy()
         log("finish", "Generating dates and filtering returns.", 2, log_path)
+        if not run:
+            return
+
+        if run_dir is not None:
+            self.save_checkpoint()
+        self.calculate(batched)
+
+    @classmethod
+    def resume(cls, run_dir, threads=None):
+        """Continua uma execução com checkpoint interrompida. As janelas já salvas em run_dir
+        não são recalculadas, e as que geraram exceção são tentadas novamente
+
+        Arguments:
+            run_dir {str} -- Pasta de checkpoint utilizada na execução original
+
+        Keyword Arguments:
+            threads {int} -- Quantidade de threads (default: {None}, a mesma da execução original)
+
+        Returns:
+            Strategy -- Estratégia completa
+        """
+        with open(os.path.join(run_dir, "strategy.pickle"), "rb") as f:
+            strategy = pickle.load(f)
+        strategy.__run_dir = run_dir
+        if threads is not None:
+            strategy.__threads = threads
+        strategy.calculate()
+        return strategy
+
+    def calculate(self, batched=False):
+        """Calcula os pesos de todas as janelas e simula a estratégia
+
+        Keyword Arguments:
+            batched {bool} -- Se True, usa o gradiente projetado vetorizado (default: {False})
+        """
 
         # Calcular peso para cada período utilizando multithread
         log(
             "start",
             "Calculating weights from {} periods".format(len(self.list_of_dates)),
             3,
-            log_path,
+            self.log_path,
         )
-        p = Pool(threads)
-        self.strategy_weights = p.map(self.calculate_weights, self.list_of_dates)
-        p.close()
-        p.join()
-        self.strategy_weights = pd.concat(self.strategy_weights, sort=True)
+        if batched:
+            results = self.calculate_weights_batched(self.list_of_dates)
+        else:
+            results = self.calculate_weights_parallel(
+                self.list_of_dates, self.__threads, self.__warm_start
+            )
+        self.assemble(results)
+
+    def save_checkpoint(self):
+        """Inicia a pasta de checkpoint, salvando a estratégia ainda sem pesos e removendo janelas de execuções anteriores"""
+        windows_dir = os.path.join(self.__run_dir, "windows")
+        os.makedirs(windows_dir, exist_ok=True)
+        for entry in os.scandir(windows_dir):
+            os.remove(entry.path)
+        with open(os.path.join(self.__run_dir, "strategy.pickle"), "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def assemble(self, results):
+        """Junta os pesos e a telemetria das janelas e simula a estratégia
+
+        Arguments:
+            results {list} -- Pesos e telemetria de cada janela, na ordem de list_of_dates
+        """
+
+        self.weights = WeightMatrix.from_rows([r[0] for r in results])
+
+        # Telemetria de cada janela: otimizador, iterações, avaliações, tempo e status
+        self.telemetry = pd.DataFrame([r[1] for r in results]).set_index("period")
         log(
             "finish",
             "Calculating weights from {} periods".format(len(self.list_of_dates)),
             3,
-            log_path,
+            self.log_path,
         )
 
-        log("start", "Simulating Strategy", 5, log_path)
-        self.strategy_cumret = self.calculate_return(self.rets, self.strategy_weights)
+        log("start", "Simulating Strategy", 5, self.log_path)
+        self.strategy_cumret = self.calculate_return(self.rets, self.weights)
         self.strategy_ret = calc.ret_from_cum_ret(self.strategy_cumret)
-        log("finish", "Simulating Strategy", 5, log_path)
+        log("finish", "Simulating Strategy", 5, self.log_path)
+
+    def extend(self, new_rets, date_to=None):
+        """Estende a estratégia com novos dados de mercado sem recalcular o histórico.
+        Apenas as janelas que passam a existir com as novas datas são otimizadas; a janela que estava
+        cortada em date_to mantém os pesos e só tem o fim do período out-of-sample atualizado.
+        A cota continua do último dia anterior ao primeiro período alterado.
+
+        Arguments:
+            new_rets {DataFrame} -- Retornos novos. Pode conter o histórico, apenas os dias posteriores aos já
+                utilizados são acrescentados
+
+        Keyword Arguments:
+            date_to {str} -- Nova data final da análise (default: {None}, último dia de new_rets)
+        """
+
+        if self.__os_equal_is:
+            raise ValueError("Strategies with os_equal_is can not be extended")
+
+        new_rets = new_rets.loc[new_rets.index > self.rets.index[-1]]
+        if date_to is None:
+            if new_rets.empty:
+                return
+            date_to = new_rets.index[-1]
+        if date_to <= self.__date_to:
+            return
+
+        log("start", "Extending strategy to {}".format(date_to), 7, self.log_path)
+        self.rets = read_only(
+            pd.concat([self.rets, new_rets.loc[:date_to]], sort=False)
+        )
+        self.__panels = {}
+        old_dates = self.list_of_dates
+        self.__date_to = date_to
+        self.list_of_dates = gen_dates(
+            time_is=self.__time_is,
+            time_os=self.__time_os,
+            date_from=self.__date_from,
+            date_to=date_to,
+        )
+
+        # Janelas com o mesmo período in-sample já foram otimizadas; só o fim do período out-of-sample pode mudar
+        old_labels = {tuple(d[:2]): d[2] + "/" + d[3] for d in old_dates}
+        relabel, new_dates = {}, []
+        for dates in self.list_of_dates:
+            label = dates[2] + "/" + dates[3]
+            old_label = old_labels.get(tuple(dates[:2]))
+            if old_label is None:
+                new_dates.append(dates)
+            elif old_label != label:
+                relabel[old_label] = label
+        self.weights = self.weights.relabel(relabel)
+        self.telemetry = self.telemetry.rename(index=relabel)
+
+        previous = None
+        if self.__warm_start and len(self.weights):
+            previous = self.weights.row(-1).to_frame().T
+        results = []
+        for dates in new_dates:
+            portfolio, telemetry = self.calculate_weights(dates, previous=previous)
+            if self.__warm_start and portfolio is not None:
+                previous = portfolio
+            results.append((portfolio, telemetry))
+
+        if results:
+            self.weights = self.weights.append(
+                WeightMatrix.from_rows([r[0] for r in results])
+            )
+            self.telemetry = pd.concat(
+                [
+                    self.telemetry,
+                    pd.DataFrame([r[1] for r in results]).set_index("period"),
+                ],
+                sort=False,
+            )
+
+        # Simula apenas a partir do primeiro período alterado, partindo da cota do dia anterior
+        changed = [label.split("/")[0] for label in relabel.values()]
+        changed += [dates[2] for dates in new_dates]
+        if changed:
+            start = min(changed)
+            kept = self.strategy_cumret[self.strategy_cumret.index < start]
+            share = kept.iloc[-1] if len(kept) else 1
+            weights = self.weights.select(
+                self.weights.starts >= np.datetime64(start, "D")
+            )
+            self.strategy_cumret = pd.concat(
+                [kept, calc.simulate_weights(self.rets.loc[start:], weights, share)]
+            )
+            self.strategy_ret = calc.ret_from_cum_ret(self.strategy_cumret)
+        log("finish", "Extending strategy to {}".format(date_to), 7, self.log_path)
+
+    def filter_returns(self, rets):
+        """Filtra os retornos pelas datas da estratégia, sem copiá-los. Aplicar o filtro a retornos já filtrados
+        não os altera. O recorte é somente leitura, para que nenhuma etapa altere os retornos recebidos ou o painel
+        compartilhado
+
+        Arguments:
+            rets {DataFrame} -- Retornos
+
+        Returns:
+            DataFrame -- Retornos entre date_from e date_to, sem o primeiro dia
+        """
+        return read_only(rets.loc[self.__first_day : self.__date_to])
+
+    def share_returns(self, enabled):
+        """Liga ou desliga o painel compartilhado: enquanto ligado, a estratégia é serializada para os
+        processos sem os retornos, que são obtidos do painel aberto em cada processo (ver shared.attach)
+
+        Arguments:
+            enabled {bool} -- Se True, os retornos não são serializados
+        """
+        self.__shared = enabled
+
+    def __getstate__(self):
+        # Com o painel compartilhado, os retornos não são serializados junto com cada tarefa
+        state = self.__dict__.copy()
+        if self.__shared:
+            del state["rets"]
+
+        # Os painéis dos indicadores não são serializados: nos processos, vêm de shared.cached_panel
+        state["_Strategy__panels"] = {}
+        return state
+
+    def __setstate__(self, state):
+        # Estratégias salvas antes de WeightMatrix guardam os pesos em DataFrame
+        if "strategy_weights" in state:
+            state["weights"] = WeightMatrix.from_frame(state.pop("strategy_weights"))
+        self.__dict__.update(state)
+        if "rets" not in state:
+            self.rets = self.filter_returns(shared.current())
+
+    def calculate_weights_parallel(self, list_of_dates, threads, warm_start):
+        """Calcula os pesos de cada janela em paralelo, uma otimização por janela
+
+        Arguments:
+            list_of_dates {list} -- Datas das janelas, em ordem cronológica
+            threads {int} -- Quantidade de processos ou threads
+            warm_start {bool} -- Se True, cada processo resolve um bloco de janelas consecutivas
+
+        Returns:
+            list -- Pesos e telemetria de cada janela
+        """
+
+        # Com processos, o painel de retornos é publicado uma vez e as tarefas levam apenas as datas de cada janela
+        with Executor(self.__executor, threads, self.rets) as executor:
+            self.share_returns(not executor.shares_memory)
+            try:
+                if warm_start:
+                    # Cada worker resolve um bloco de janelas consecutivas, aproveitando a solução anterior
+                    size = -(-len(list_of_dates) // threads)
+                    chunks = [
+                        list_of_dates[i : i + size]
+                        for i in range(0, len(list_of_dates), size)
+                    ]
+                    results = [
+                        result
+                        for chunk in executor.map(self.calculate_weights_chain, chunks)
+                        for result in chunk
+                    ]
+                else:
+                    results = executor.map(self.calculate_weights, list_of_dates)
+            finally:
+                self.share_returns(False)
+        return results
+
+    def calculate_weights_batched(self, list_of_dates):
+        """Calcula os pesos de todas as janelas em uma única otimização vetorizada
+        (ver port_optimization.gen_port_batched)
+
+        Arguments:
+            list_of_dates {list} -- Datas das janelas, em ordem cronológica
+
+        Returns:
+            list -- Pesos e telemetria de cada janela
+        """
+
+        windows = [self.in_sample_returns(dates) for dates in list_of_dates]
+        row_names = [
+            str(date_from_os) + "/" + str(date_to_os)
+            for _, _, date_from_os, date_to_os in list_of_dates
+        ]
+        options = {}
+        if self.__minimization_tolerance is not None:
+            options["tol"] = self.__minimization_tolerance
+        weights, telemetry = p_opt.gen_port_batched(
+            windows,
+            row_names,
+            self.method,
+            self.__min_w,
+            self.__max_w,
+            full_output=True,
+            **options
+        )
 
-    def calculate_weights(self, dates):
+        results = {}
+        for info in telemetry:
+            info["method"] = self.method
+            portfolio = None
+            if info["period"] in weights.index:
+                portfolio = weights.loc[[info["period"]]].dropna(axis="columns")
+            results[info["period"]] = (portfolio, info)
+        return [results[name] for name in row_names]
+
+    def calculate_weights_chain(self, list_of_dates):
+        """Calcula os pesos de janelas consecutivas em sequência, iniciando cada otimização
+        pela solução da janela anterior
+
+        Arguments:
+            list_of_dates {list} -- Datas das janelas, em ordem cronológica
+
+        Returns:
+            list -- Pesos e telemetria de cada janela
+        """
+
+        results = []
+        previous = None
+        for dates in list_of_dates:
+            portfolio, telemetry = self.calculate_weights(dates, previous=previous)
+            if portfolio is not None:
+                previous = portfolio
+            results.append((portfolio, telemetry))
+        return results
+
+    def in_sample_returns(self, dates):
+        """Retorna os retornos in-sample da janela (ver preprocess_window). Nos processos com painel
+        compartilhado, o resultado é reaproveitado por outras estratégias com a mesma janela e o mesmo
+        pré-processamento (ver shared.cached)
+
+        Arguments:
+            dates {list} -- Datas in-sample e out-of-sample da janela
+
+        Returns:
+            DataFrame -- Retornos in-sample, sem ações com dados faltando
+        """
+
+        key = (
+            self.__date_from,
+            self.__date_to,
+            dates[0],
+            dates[1],
+            repr(self.__indicators),
+        )
+        return shared.cached(key, lambda: self.preprocess_window(dates))
+
+    def preprocess_window(self, dates):
+        """Filtra os retornos in-sample da janela, aplicando EWMA, RSI e os demais indicadores configurados
+
+        Arguments:
+            dates {list} -- Datas in-sample e out-of-sample da janela
+
+        Returns:
+            DataFrame -- Retornos in-sample, sem ações com dados faltando
+        """
+
+        # Filtra os retornos para ter apenas o que é in-sample
+        date_from_is, date_to_is, _, _ = dates
+        # A cópia da janela deixa os dados sempre no mesmo layout de memória, para que o resultado não dependa
+        # da origem do painel (DataFrame do usuário ou painel compartilhado)
+        rets_is = self.rets.loc[date_from_is:date_to_is].dropna(axis="columns").copy()
+
+        # Indicadores com painel usam a janela do painel calculado uma única vez sobre todos os retornos
+        for number, (name, params) in enumerate(self.__indicators):
+            apply, panel = ind.INDICATORS[name]
+            signal = None
+            if panel is not None:
+                signal = self.indicator_panel(number).loc[
+                    date_from_is:date_to_is, rets_is.columns
+                ]
+            rets_is = apply(rets_is, signal, **params)
+
+        # O resultado é reaproveitado por outras estratégias do processo (ver in_sample_returns)
+        return read_only(rets_is)
+
+    def indicator_panel(self, number):
+        """Retorna o painel de um indicador sobre todos os retornos. Nos processos com painel compartilhado,
+        o painel é calculado uma vez por processo e reaproveitado pelas tarefas e estratégias com as mesmas
+        datas e o mesmo indicador (ver shared.cached_panel); nos demais casos, uma vez por estratégia
+
+        Arguments:
+            number {int} -- Posição do indicador na lista de indicadores da estratégia
+
+        Returns:
+            DataFrame -- Painel do indicador
+        """
+        if number not in self.__panels:
+            name, params = self.__indicators[number]
+            key = ("indicator", self.__date_from, self.__date_to, name, repr(params))
+            self.__panels[number] = shared.cached_panel(
+                key, lambda: read_only(ind.INDICATORS[name][1](self.rets, **params))
+            )
+        return self.__panels[number]
+
+    def calculate_weights(self, dates, previous=None):
+        """Calcula o peso das ações de uma janela. Com checkpoint, a janela é lida de run_dir se já
+        tiver sido calculada, e salva assim que termina
+
+        Arguments:
+            dates {list} -- Datas in-sample e out-of-sample da janela
+
+        Keyword Arguments:
+            previous {DataFrame} -- Pesos da janela anterior, utilizados como ponto inicial da otimização (default: {None})
+
+        Returns:
+            DataFrame -- Pesos da janela (None se a otimização falhar)
+            dict -- Telemetria da otimização (ver port_optimization.telemetry)
+        """
+
+        if self.__run_dir is None:
+            return self.calculate_window(dates, previous=previous)
+
+        period = str(dates[2]) + "/" + str(dates[3])
+        path = os.path.join(
+            self.__run_dir, "windows", period.replace("/", "_") + ".pickle"
+        )
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+            if "error" not in result[1]:
+                return result
+
+        # Uma exceção em uma janela é registrada na telemetria, sem interromper as demais
+        try:
+            result = self.calculate_window(dates, previous=previous)
+        except Exception as e:
+            log("Error ocurred in calculation of period {}: {!r}".format(period, e))
+            telemetry = {
+                "success": False,
+                "error": repr(e),
+                "period": period,
+                "method": self.method,
+            }
+            result = (None, telemetry)
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return result
+
+    def calculate_window(self, dates, previous=None):
         """Calcula o peso das ações utilizando cada estratégia
 
         Arguments:
             dates {[type]} -- [description]
 
+        Keyword Arguments:
+            previous {DataFrame} -- Pesos da janela anterior, utilizados como ponto inicial da otimização (default: {None})
+
         Returns:
-            [type] -- [description]
+            DataFrame -- Pesos da janela (None se a otimização falhar)
+            dict -- Telemetria da otimização (ver port_optimization.telemetry)
         """
 
         date_from_is, date_to_is, date_from_os, date_to_os = dates
@@ -133,33 +640,11 @@ class Strategy:
             4,
             self.log_path,
         )
-        # Obtém datas in sample e out of sample, e filtra os retornos para ter apenas o que é in-sample.
-
-        rets_is = deepcopy(self.rets.loc[date_from_is:date_to_is])
-        rets_is.dropna(axis="columns", inplace=True)
-        # Tentativa de aplicação de conceitos de EWMA (Performance e implementação ainda não validados)
-        if self.__ewma > 1:
-            rets_is = rets_is.sort_index(ascending=False)
-            rets_is = rets_is.ewm(
-                span=self.__ewma, min_periods=0, adjust=False, ignore_na=False
-            ).mean()
-            rets_is = rets_is.sort_index(ascending=True)
-
-        # Tentativa de aplicação de conceitos de RSI (Performance e implementação ainda não validados)
-        if self.__rsi == True:
-            delta = deepcopy(rets_is)
-            dUp = delta[delta > 0]
-            dDown = delta[delta < 0]
-            dUp[delta <= 0] = 0
-            dDown[delta >= 0] = 0
-            n = 21 * 4
-            RolUp = dUp.rolling(n).mean()
-            RolDown = dDown.rolling(n).mean().abs()
-            RS = 100 - 100 / (1 + RolUp / RolDown)
-            rets_is = rets_is.iloc[:, np.array(RS.iloc[-1, :] < 70)]
+        rets_is = self.in_sample_returns(dates)
 
         # Com base no critério de seleção de portfólio escolhido, calcula os pesos
         if self.method == "random" or self.method == "equally_weighted":
+            start = time.time()
             portfolio = p_opt.gen_port(
                 rets=rets_is,
                 opt_method=self.method,
@@ -167,19 +652,43 @@ class Strategy:
                 date_to=date_to_is,
                 row_name=str(date_from_os) + "/" + str(date_to_os),
             )
+            telemetry = {"solver": None, "success": True, "time": time.time() - start}
 
         else:
-            portfolio = p_opt.gen_port_optimized(
-                rets_is,
-                date_from=date_from_is,
-                date_to=date_to_is,
-                opt_method=self.method,
-                extra_args=self.__args,
-                row_name=str(date_from_os) + "/" + str(date_to_os),
-                min_w=self.__min_w,
-                max_w=self.__max_w,
-                minimization_tolerance=self.__minimization_tolerance,
-            )
+            x0 = None
+            if previous is not None:
+                x0 = p_opt.warm_start_weights(
+                    previous, rets_is.columns, self.__min_w, self.__max_w
+                )
+
+            # Resultados de janelas já otimizadas com os mesmos dados e parâmetros vêm do cache
+            cached = None
+            if self.__cache is not None:
+                key = self.__cache.key(
+                    rets_is,
+                    self.method,
+                    self.__args,
+                    self.__min_w,
+                    self.__max_w,
+                    self.__minimization_tolerance,
+                    self.__annualization,
+                    self.__solver,
+                    self.__covariance,
+                    self.__covariance_args,
+                    x0,
+                )
+                cached = self.__cache.get(key)
+
+            if cached is not None:
+                portfolio, telemetry = cached
+                if portfolio is not None:
+                    portfolio.index = [str(date_from_os) + "/" + str(date_to_os)]
+                telemetry["cached"] = True
+            else:
+                portfolio, telemetry = self.optimize_window(rets_is, dates, x0)
+                if self.__cache is not None:
+                    self.__cache.put(key, (portfolio, telemetry))
+                    telemetry["cached"] = False
 
         log(
             "finish",
@@ -190,75 +699,94 @@ class Strategy:
             4,
             self.log_path,
         )
-        return portfolio
+        telemetry["period"] = str(date_from_os) + "/" + str(date_to_os)
+        telemetry["method"] = self.method
+        return portfolio, telemetry
+
+    def optimize_window(self, rets_is, dates, x0=None):
+        """Otimiza os pesos de uma janela com o método da estratégia
+
+        Arguments:
+            rets_is {DataFrame} -- Retornos in-sample da janela
+            dates {list} -- Datas in-sample e out-of-sample da janela
+
+        Keyword Arguments:
+            x0 {array} -- Ponto inicial da otimização (default: {None})
+
+        Returns:
+            DataFrame -- Pesos da janela (None se a otimização falhar)
+            dict -- Telemetria da otimização (ver port_optimization.telemetry)
+        """
+
+        date_from_is, date_to_is, date_from_os, date_to_os = dates
+
+        # Métodos de média-variância usam os momentos calculados uma única vez por janela
+        moments = None
+        if self.method in p_opt.OBJECTIVES and p_opt.OBJECTIVES[self.method][1]:
+            moments = obj.Moments(
+                rets_is,
+                annualization=self.__annualization,
+                covariance=self.__covariance,
+                covariance_args=self.__covariance_args,
+            )
+
+        portfolio, opts = p_opt.gen_port_optimized(
+            rets_is,
+            date_from=date_from_is,
+            date_to=date_to_is,
+            opt_method=self.method,
+            extra_args=self.__args,
+            row_name=str(date_from_os) + "/" + str(date_to_os),
+            min_w=self.__min_w,
+            max_w=self.__max_w,
+            minimization_tolerance=self.__minimization_tolerance,
+            moments=moments,
+            x0=x0,
+            solver=self.__solver,
+            full_output=True,
+        )
+        return portfolio, p_opt.telemetry(opts)
+
+    @property
+    def strategy_weights(self):
+        """Pesos no formato DataFrame (um período por linha, NaN para as ações fora da carteira),
+        convertidos a partir de weights a cada acesso"""
+        return self.weights.to_frame()
+
+    @strategy_weights.setter
+    def strategy_weights(self, frame):
+        self.weights = WeightMatrix.from_frame(frame)
 
     def calculate_return(self, rets, weights):
         """Calcula o retorno dos diferentes pesos por período
 
         Arguments:
             rets {Dataframe} -- Retornos
-            weights {Dataframe} -- Pesos
+            weights {WeightMatrix} -- Pesos
 
         Returns:
             Series -- Retornos da estratégia
         """
 
-        # Filtra os retornos do período
-        rets = deepcopy(rets)
-        rets = rets.loc[
-            weights.index[0].split("/")[0] : weights.index[-1].split("/")[1]
-        ]
-        rets = rets.fillna(0)
-        calculated_ret = pd.Series()
-
-        # Define uma cota com o valor de 1.
-        share = 1
-        # A cada iteração do primeiro loop, é selecionado uma linha do peso
-        for index_p, row_p in weights.iterrows():
-            date_from, date_to = index_p.split("/")
-            row_p = row_p * share
-            # A cada iteração do segundo loop, é calculada cada peso multiplicado pelo seu retorno, e a sua soma é salva para ser retornada
-            for index_r, row_r in rets.iterrows():
-                if index_r >= date_from and index_r < date_to:
-                    row_p = row_p.multiply(1 + row_r)
-                    calculated_ret[index_r] = row_p.sum()
-
-                    # Ao final, é salvo o valor da sua cota para ser utilizada no próximo peso
-                    share = calculated_ret[index_r]
-                elif index_r > date_to:
-                    break
-
-        return calculated_ret
+        return calc.simulate_weights(rets, weights)
 
     def print_weights(self):
         """Imprime pesos do portfólio"""
 
-        s_weights = deepcopy(self.strategy_weights)
-        s_weights.fillna(0.0, inplace=True)
-        for i, row in enumerate(self.strategy_weights.iterrows()):
+        turnover = self.weights.turnover(0.000001)
+        exits = self.weights.exits(0.000001)
+        entries = self.weights.entries(0.000001)
+        for i, label in enumerate(self.weights.labels):
             print("")
             print("-" * 10)
-            print(row[0])
+            print(label)
             if i >= 1:
-                turnover = s_weights.iloc[i, :] - s_weights.iloc[i - 1, :]
-                turnover = turnover[turnover > 0.000001].sum()
-                print("Turnover:", "{0:.2%}".format(turnover))
-                print(
-                    "Stocks that left:",
-                    (
-                        (s_weights.iloc[i, :] < 0.000001)
-                        & (s_weights.iloc[i - 1, :] > 0.000001)
-                    ).sum(),
-                )
-                print(
-                    "New Stocks:",
-                    (
-                        (s_weights.iloc[i, :] > 0.000001)
-                        & (s_weights.iloc[i - 1, :] < 0.000001)
-                    ).sum(),
-                )
-            print("Portfolio size:", row[1][row[1] > 0.000001].size)
-            weights = row[1][row[1] > 0.000001].sort_values(ascending=False).to_frame()
+                print("Turnover:", "{0:.2%}".format(turnover[i - 1]))
+                print("Stocks that left:", exits[i - 1])
+                print("New Stocks:", entries[i - 1])
+            row = self.weights.row(i)
+            print("Portfolio size:", row[row > 0.000001].size)
+            weights = row[row > 0.000001].sort_values(ascending=False).to_frame()
             weights.columns = [""] * len(weights.columns)
             weights[""] = round(weights[""] * 100, 2)
             weights = weights.astype(str)
@@ -274,7 +802,7 @@ class Benchmark:
             benchmark_rets {DataFrame} -- Retornos do benchmark
             name {str} -- Nome do benchmark
         """
-        self.strategy_ret = benchmark_rets["Return"]
+        self.strategy_ret = benchmark_rets["Return"].copy(deep=False)
         self.name = name
         self.strategy_cumret = calc.cum_ret(benchmark_rets)
         self.strategy_ret.index = self.strategy_ret.index.map(str)
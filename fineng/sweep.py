@@ -0,0 +1,153 @@
+import itertools
+from datetime import datetime
+
+import fineng.port_optimization as p_opt
+from fineng.executor import Executor
+from fineng.strategy import Strategy
+from fineng.utils import log
+
+
+def expand_grid(grid):
+    """Gera todas as combinações de uma grade de parâmetros
+
+    Arguments:
+        grid {dict} -- Valores de cada parâmetro, ex: {'method': ['max_sharpe', 'min_vol'], 'max_w': [0.05, 0.1]}
+
+    Returns:
+        list -- Uma configuração (dict) por combinação
+    """
+    keys = list(grid)
+    return [
+        dict(zip(keys, values))
+        for values in itertools.product(*[grid[k] for k in keys])
+    ]
+
+
+def config_name(config, varying):
+    """Nome de uma configuração a partir dos parâmetros que variam na grade
+
+    Arguments:
+        config {dict} -- Configuração
+        varying {list} -- Parâmetros com mais de um valor na grade
+
+    Returns:
+        str -- Nome, ex: 'max_sharpe max_w=0.05'
+    """
+    parts = [str(config["method"])] if "method" in config else []
+    parts += [
+        "{}={}".format(k, config[k]) for k in varying if k != "method" and k in config
+    ]
+    return " ".join(parts)
+
+
+def task_cost(method, dates):
+    """Estimativa do custo de otimizar uma janela, usada para começar pelas mais demoradas.
+    Cresce com o tamanho do período in-sample; métodos que usam todos os cenários de retorno
+    (CVar, dominância estocástica) pesam mais que os de média-variância
+
+    Arguments:
+        method {str} -- Método da estratégia
+        dates {list} -- Datas da janela
+
+    Returns:
+        float -- Custo relativo
+    """
+    days = (
+        datetime.strptime(dates[1], "%Y-%m-%d")
+        - datetime.strptime(dates[0], "%Y-%m-%d")
+    ).days
+    if method in ("random", "equally_weighted"):
+        return 0.01 * days
+    if method in p_opt.OBJECTIVES and p_opt.OBJECTIVES[method][1]:
+        return days
+    return 5 * days
+
+
+def solve_window(task):
+    """Calcula os pesos de uma janela de uma estratégia (executado nos processos do pool)
+
+    Arguments:
+        task {tuple} -- Posição da estratégia, posição da janela, estratégia e datas da janela
+
+    Returns:
+        tuple -- Posição da estratégia, posição da janela e resultado de Strategy.calculate_weights
+    """
+    i, j, strategy, dates = task
+    return i, j, strategy.calculate_weights(dates)
+
+
+def prepare(rets, grid, log_path="log.csv", **kwargs):
+    """Cria uma estratégia sem pesos (Strategy com run=False) para cada combinação da grade
+
+    Arguments:
+        rets {DataFrame} -- Retornos
+        grid {dict} -- Valores de cada parâmetro de Strategy
+
+    Keyword Arguments:
+        log_path {str} -- Caminho do log (default: {'log.csv'})
+        **kwargs -- Parâmetros de Strategy comuns a todas as configurações
+
+    Returns:
+        list -- Estratégias, uma por configuração
+    """
+
+    configs = expand_grid(grid)
+    varying = [k for k in grid if len(grid[k]) > 1]
+    if any(
+        {**kwargs, **config}.get(k)
+        for config in configs
+        for k in ("warm_start", "batched")
+    ):
+        raise ValueError("Sweep does not support warm_start or batched strategies")
+
+    strategies = []
+    for config in configs:
+        params = {**kwargs, **config}
+        params.setdefault("name", config_name(config, varying))
+        strategies.append(Strategy(rets=rets, log_path=log_path, run=False, **params))
+    return strategies
+
+
+def sweep(rets, grid, threads=1, log_path="log.csv", **kwargs):
+    """Executa todas as combinações de uma grade de parâmetros de Strategy em um único pool de workers.
+    Com processos, o painel de retornos é publicado uma vez para todas as configurações e o pré-processamento
+    de cada janela é reaproveitado entre configurações dentro de cada processo. As tarefas (configuração, janela)
+    são escalonadas da mais demorada para a mais rápida.
+
+    Arguments:
+        rets {DataFrame} -- Retornos
+        grid {dict} -- Valores de cada parâmetro de Strategy, ex: {'method': ['max_sharpe', 'min_vol'], 'time_is': [6, 12]}
+
+    Keyword Arguments:
+        threads {int} -- Quantidade de processos ou threads (ver o parâmetro executor de Strategy) (default: {1})
+        log_path {str} -- Caminho do log (default: {'log.csv'})
+        **kwargs -- Parâmetros de Strategy comuns a todas as configurações
+
+    Returns:
+        list -- Estratégias, uma por configuração, no formato aceito por analysis.compare_strategies
+    """
+
+    strategies = prepare(rets, grid, log_path, **kwargs)
+    tasks = [
+        (i, j, strategy, dates)
+        for i, strategy in enumerate(strategies)
+        for j, dates in enumerate(strategy.list_of_dates)
+    ]
+    tasks.sort(key=lambda t: task_cost(t[2].method, t[3]), reverse=True)
+    log("start", "Sweeping {} windows".format(len(tasks)), 6, log_path)
+
+    results = [[None] * len(s.list_of_dates) for s in strategies]
+    with Executor(kwargs.get("executor", "processes"), threads, rets) as executor:
+        for strategy in strategies:
+            strategy.share_returns(not executor.shares_memory)
+        try:
+            for i, j, result in executor.imap_unordered(solve_window, tasks):
+                results[i][j] = result
+        finally:
+            for strategy in strategies:
+                strategy.share_returns(False)
+    log("finish", "Sweeping {} windows".format(len(tasks)), 6, log_path)
+
+    for strategy, result in zip(strategies, results):
+        strategy.assemble(result)
+    return strategies
@@ -3,6 +3,7 @@ import os
 import dateutil.relativedelta
 from copy import deepcopy
 
+import numpy as np
 import pandas as pd
 
 
@@ -102,7 +103,8 @@ def gen_dates(time_is, time_os, date_from="2013-01-01", date_to="2017-12-31"):
 
 
 def same_index(rets1, rets2):
-    """Garante que 2 dataframes tenham os mesmos índices
+    """Garante que 2 dataframes tenham os mesmos índices. Os dataframes recebidos não são alterados:
+    os retornados compartilham os dados com eles e têm apenas um novo índice
 
     Arguments:
         rets1 {dataframe} -- Retorno
@@ -112,6 +114,8 @@ def same_index(rets1, rets2):
         dataframe -- Retorno
         dataframe -- Retorno
     """
+    rets1 = rets1.copy(deep=False)
+    rets2 = rets2.copy(deep=False)
     rets1.index = pd.to_datetime(rets1.index)
     rets2.index = pd.to_datetime(rets2.index)
 
@@ -121,3 +125,19 @@ def same_index(rets1, rets2):
     rets1 = rets1.loc[from_date:to_date]
     rets2 = rets2.loc[from_date:to_date]
     return rets1, rets2
+
+
+def read_only(frame):
+    """Retorna um DataFrame somente leitura com os mesmos dados, sem copiá-los quando todas as colunas
+    têm o mesmo tipo. Uma alteração no lugar (ex: df.iloc[0] = 0) gera ValueError em vez de alterar
+    os retornos de quem chamou ou o painel compartilhado
+
+    Arguments:
+        frame {dataframe} -- Tabela
+
+    Returns:
+        dataframe -- Tabela somente leitura
+    """
+    values = np.asarray(frame).view()
+    values.flags.writeable = False
+    return pd.DataFrame(values, index=frame.index, columns=frame.columns, copy=False)
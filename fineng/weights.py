@@ -0,0 +1,289 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class WeightMatrix:
+    def __init__(self, values, assets, starts, ends):
+        """Pesos de uma estratégia em uma matriz (períodos x ações) sobre um universo fixo de ações.
+        No formato esparso (CSR) apenas as posições com peso são guardadas, então a memória e as
+        métricas crescem com a quantidade de ações na carteira e não com o tamanho do universo.
+
+        Arguments:
+            values {array ou csr_matrix} -- Pesos (períodos x ações), com zero para as ações fora da carteira
+            assets {Index} -- Nome das ações de cada coluna
+            starts {array} -- Data inicial de cada período (datetime64)
+            ends {array} -- Data final de cada período (datetime64)
+        """
+        self.values = values
+        self.assets = pd.Index(assets)
+        self.starts = np.asarray(starts, dtype="datetime64[D]")
+        self.ends = np.asarray(ends, dtype="datetime64[D]")
+
+    @classmethod
+    def from_rows(cls, rows, dense=False):
+        """Monta a matriz a partir das linhas de pesos de cada janela, sem alinhar DataFrames
+
+        Arguments:
+            rows {list} -- DataFrames de uma linha com index 'data_inicial/data_final' (None é ignorado)
+
+        Keyword Arguments:
+            dense {bool} -- Se True, guarda a matriz densa em vez de CSR (default: {False})
+
+        Returns:
+            WeightMatrix -- Pesos
+        """
+        rows = [r for r in rows if r is not None]
+        assets = sorted(set().union(*[r.columns for r in rows]))
+        position = {asset: i for i, asset in enumerate(assets)}
+
+        data, indices, indptr = [], [], [0]
+        for row in rows:
+            weights = row.iloc[0]
+            weights = weights[weights.notna() & (weights != 0)]
+            data.append(weights.values.astype(float))
+            indices.append(np.array([position[a] for a in weights.index], dtype=int))
+            indptr.append(indptr[-1] + weights.size)
+
+        values = sparse.csr_matrix(
+            (
+                np.concatenate(data) if data else np.zeros(0),
+                np.concatenate(indices) if indices else np.zeros(0, dtype=int),
+                indptr,
+            ),
+            shape=(len(rows), len(assets)),
+        )
+        labels = [r.index[0] for r in rows]
+        weights = cls(values, assets, *_parse_labels(labels))
+        return weights.to_dense() if dense else weights
+
+    @classmethod
+    def from_frame(cls, frame, dense=False):
+        """Converte o DataFrame de pesos (um período por linha, NaN para ações fora da carteira)
+
+        Arguments:
+            frame {DataFrame} -- Pesos com index 'data_inicial/data_final'
+
+        Keyword Arguments:
+            dense {bool} -- Se True, guarda a matriz densa em vez de CSR (default: {False})
+
+        Returns:
+            WeightMatrix -- Pesos
+        """
+        values = np.nan_to_num(np.asarray(frame, dtype=float))
+        if not dense:
+            values = sparse.csr_matrix(values)
+        return cls(values, frame.columns, *_parse_labels(frame.index))
+
+    def to_frame(self):
+        """Converte para o DataFrame de pesos, com NaN para as ações fora da carteira
+
+        Returns:
+            DataFrame -- Pesos com index 'data_inicial/data_final'
+        """
+        values = self.values.toarray() if sparse.issparse(self.values) else self.values
+        values = np.where(values != 0, values, np.nan)
+        return pd.DataFrame(values, index=self.labels, columns=self.assets)
+
+    def to_dense(self):
+        """Retorna a mesma matriz no formato denso"""
+        if not sparse.issparse(self.values):
+            return self
+        return WeightMatrix(self.values.toarray(), self.assets, self.starts, self.ends)
+
+    def select(self, rows):
+        """Seleciona períodos
+
+        Arguments:
+            rows {array} -- Máscara booleana ou posições dos períodos
+
+        Returns:
+            WeightMatrix -- Pesos dos períodos selecionados, sobre o mesmo universo de ações
+        """
+        rows = np.flatnonzero(rows) if np.asarray(rows).dtype == bool else rows
+        return WeightMatrix(
+            self.values[rows], self.assets, self.starts[rows], self.ends[rows]
+        )
+
+    def relabel(self, mapping):
+        """Renomeia períodos, sem alterar os pesos
+
+        Arguments:
+            mapping {dict} -- Nome atual ('data_inicial/data_final') e novo nome de cada período renomeado
+
+        Returns:
+            WeightMatrix -- Pesos com os novos períodos
+        """
+        starts, ends = self.starts.copy(), self.ends.copy()
+        positions = self.labels.get_indexer(list(mapping))
+        found = positions >= 0
+        if found.any():
+            new_starts, new_ends = _parse_labels(
+                np.array(list(mapping.values()))[found]
+            )
+            starts[positions[found]] = new_starts
+            ends[positions[found]] = new_ends
+        return WeightMatrix(self.values, self.assets, starts, ends)
+
+    def append(self, other):
+        """Acrescenta os períodos de outra matriz depois dos desta. O universo passa a ser a união dos
+        dois universos, e apenas as posições das ações nas colunas são remapeadas, sem densificar a matriz
+
+        Arguments:
+            other {WeightMatrix} -- Pesos dos novos períodos
+
+        Returns:
+            WeightMatrix -- Pesos de todos os períodos, no formato (denso ou CSR) desta matriz
+        """
+        if not len(other):
+            return self
+        assets = self.assets.union(other.assets)
+        values = [
+            _reindex_columns(w.values, assets.get_indexer(w.assets), len(assets))
+            for w in (self, other)
+        ]
+        if sparse.issparse(self.values):
+            values = sparse.vstack([sparse.csr_matrix(v) for v in values], format="csr")
+        else:
+            values = np.vstack(
+                [v.toarray() if sparse.issparse(v) else v for v in values]
+            )
+        return WeightMatrix(
+            values,
+            assets,
+            np.concatenate([self.starts, other.starts]),
+            np.concatenate([self.ends, other.ends]),
+        )
+
+    @property
+    def labels(self):
+        """Períodos no formato 'data_inicial/data_final'"""
+        starts = np.datetime_as_string(self.starts, unit="D")
+        ends = np.datetime_as_string(self.ends, unit="D")
+        return pd.Index([s + "/" + e for s, e in zip(starts, ends)])
+
+    @property
+    def nbytes(self):
+        """Memória ocupada pelos pesos, em bytes"""
+        if sparse.issparse(self.values):
+            return (
+                self.values.data.nbytes
+                + self.values.indices.nbytes
+                + self.values.indptr.nbytes
+            )
+        return self.values.nbytes
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def held(self, i):
+        """Posições e pesos das ações na carteira em um período
+
+        Arguments:
+            i {int} -- Posição do período (negativa conta a partir do último)
+
+        Returns:
+            array -- Posições das ações em assets
+            array -- Pesos
+        """
+        i = range(len(self))[i]
+        if sparse.issparse(self.values):
+            start, end = self.values.indptr[i], self.values.indptr[i + 1]
+            return self.values.indices[start:end], self.values.data[start:end]
+        positions = np.flatnonzero(self.values[i])
+        return positions, self.values[i, positions]
+
+    def row(self, i):
+        """Pesos das ações na carteira em um período
+
+        Arguments:
+            i {int} -- Posição do período
+
+        Returns:
+            Series -- Pesos, apenas das ações com peso
+        """
+        positions, weights = self.held(i)
+        return pd.Series(weights, index=self.assets[positions], name=self.labels[i])
+
+    def holdings(self, threshold=0.00001):
+        """Quantidade de ações na carteira em cada período
+
+        Keyword Arguments:
+            threshold {float} -- Peso mínimo para considerar a ação na carteira (default: {0.00001})
+
+        Returns:
+            array -- Quantidade por período
+        """
+        return _row_sum(self.values > threshold)
+
+    def turnover(self, threshold=0):
+        """Turnover de cada período em relação ao anterior: soma dos aumentos de peso
+
+        Keyword Arguments:
+            threshold {float} -- Aumentos menores ou iguais a este valor são ignorados (default: {0})
+
+        Returns:
+            array -- Turnover a partir do segundo período
+        """
+        diff = self.values[1:] - self.values[:-1]
+        return _row_sum(_keep_greater(diff, threshold))
+
+    def entries(self, threshold=0.000001):
+        """Quantidade de ações que entraram na carteira em cada período
+
+        Keyword Arguments:
+            threshold {float} -- Peso mínimo para considerar a ação na carteira (default: {0.000001})
+
+        Returns:
+            array -- Entradas a partir do segundo período
+        """
+        return _row_sum(self._held_diff(threshold) > 0)
+
+    def exits(self, threshold=0.000001):
+        """Quantidade de ações que saíram da carteira em cada período
+
+        Keyword Arguments:
+            threshold {float} -- Peso mínimo para considerar a ação na carteira (default: {0.000001})
+
+        Returns:
+            array -- Saídas a partir do segundo período
+        """
+        return _row_sum(self._held_diff(threshold) < 0)
+
+    def _held_diff(self, threshold):
+        """Variação da indicação de ação na carteira (1 entrou, -1 saiu) entre períodos consecutivos"""
+        held = (self.values > threshold).astype(np.int8)
+        return held[1:] - held[:-1]
+
+
+def _parse_labels(labels):
+    """Separa os períodos 'data_inicial/data_final' em datas iniciais e finais"""
+    bounds = [str(label).split("/") for label in labels]
+    starts = np.array([b[0] for b in bounds], dtype="datetime64[D]")
+    ends = np.array([b[1] for b in bounds], dtype="datetime64[D]")
+    return starts, ends
+
+
+def _reindex_columns(values, positions, n_assets):
+    """Leva as colunas de uma matriz densa ou esparsa para as posições de um universo maior"""
+    if sparse.issparse(values):
+        values = values.tocsr()
+        return sparse.csr_matrix(
+            (values.data, positions[values.indices], values.indptr),
+            shape=(values.shape[0], n_assets),
+        )
+    reindexed = np.zeros((values.shape[0], n_assets))
+    reindexed[:, positions] = values
+    return reindexed
+
+
+def _keep_greater(values, threshold):
+    """Zera as entradas menores ou iguais a threshold, em matrizes densas ou esparsas"""
+    if sparse.issparse(values):
+        return values.multiply(values > threshold)
+    return np.where(values > threshold, values, 0)
+
+
+def _row_sum(values):
+    """Soma das linhas como array 1D, em matrizes densas ou esparsas"""
+    return np.asarray(values.sum(axis=1)).ravel()